@@ -0,0 +1,165 @@
+"""
+Аналитика ошибок учеников: выравнивание ответа с правильным словом
+и инкрементальные сводные таблицы по словам, позициям букв и категориям
+"""
+
+import json
+from difflib import SequenceMatcher
+
+from database import canonical_word, get_db
+
+# Сводка по всем ученикам хранится под отдельным идентификатором
+ALL_LEARNERS = '*'
+
+REPORT_PAGE_SIZE = 50
+REPORT_MAX_PAGE_SIZE = 500
+
+# Отчёты: запрос и ключ сортировки (по убыванию) для постраничной выдачи по курсору
+REPORTS = {
+    'words': (
+        'SELECT word, attempts, errors FROM stats_words WHERE learner_id = ?',
+        ('errors', 'word'),
+    ),
+    'positions': (
+        'SELECT word, position, letter, errors FROM stats_positions WHERE learner_id = ?',
+        ('errors', 'word', 'position'),
+    ),
+    'categories': (
+        'SELECT s.category_id, c.name AS category_name, s.attempts, s.errors '
+        'FROM stats_categories s LEFT JOIN categories c ON c.id = s.category_id '
+        'WHERE s.learner_id = ?',
+        ('s.errors', 's.category_id'),
+    ),
+}
+
+
+def error_positions(correct_word, user_answer):
+    """Позиции букв правильного слова, в которых ошибся ученик"""
+    correct = correct_word.lower()
+    answer = user_answer.lower()
+
+    positions = set()
+    matcher = SequenceMatcher(None, correct, answer, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ('replace', 'delete'):
+            # Буква заменена или пропущена
+            positions.update(range(i1, i2))
+        elif tag == 'insert':
+            # Лишние буквы относим к позиции, перед которой они вставлены
+            positions.add(min(i1, len(correct) - 1))
+
+    return sorted(p for p in positions if p >= 0)
+
+
+def record_attempt(learner_id, mode, russian_word, heard_word, correct_word, user_answer, is_correct,
+                   session_id=None):
+    """Сохранение попытки и обновление сводных таблиц одной транзакцией"""
+    errors = 0 if is_correct else 1
+    positions = [] if is_correct else error_positions(correct_word, user_answer)
+
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        # Категорию ищем по канонической форме — для слов, введённых вручную, её нет
+        cursor.execute(
+            'SELECT category_id FROM words WHERE russian_canonical = ? LIMIT 1',
+            (canonical_word(russian_word),)
+        )
+        row = cursor.fetchone()
+        category_id = row[0] if row else None
+
+        cursor.execute('''
+            INSERT INTO attempts (
+                learner_id, mode, heard_word, correct_word, user_answer, is_correct, category_id,
+                session_id
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (learner_id, mode, heard_word, correct_word, user_answer, int(is_correct), category_id,
+              session_id))
+
+        for learner in (learner_id, ALL_LEARNERS):
+            cursor.execute('''
+                INSERT INTO stats_words (learner_id, word, attempts, errors) VALUES (?, ?, 1, ?)
+                ON CONFLICT (learner_id, word)
+                DO UPDATE SET attempts = attempts + 1, errors = errors + excluded.errors
+            ''', (learner, correct_word, errors))
+
+            if category_id is not None:
+                cursor.execute('''
+                    INSERT INTO stats_categories (learner_id, category_id, attempts, errors)
+                    VALUES (?, ?, 1, ?)
+                    ON CONFLICT (learner_id, category_id)
+                    DO UPDATE SET attempts = attempts + 1, errors = errors + excluded.errors
+                ''', (learner, category_id, errors))
+
+            cursor.executemany('''
+                INSERT INTO stats_positions (learner_id, word, position, letter, errors)
+                VALUES (?, ?, ?, ?, 1)
+                ON CONFLICT (learner_id, word, position) DO UPDATE SET errors = errors + 1
+            ''', [(learner, correct_word, p, correct_word[p].lower()) for p in positions])
+
+        conn.commit()
+
+
+def get_session_results(session_id):
+    """Ответы одной тренировки по порядку — для экрана результатов"""
+    with get_db() as conn:
+        rows = conn.execute('''
+            SELECT heard_word, correct_word, user_answer, is_correct
+            FROM attempts
+            WHERE session_id = ?
+            ORDER BY id
+        ''', (session_id,)).fetchall()
+    return [{**dict(row), 'is_correct': bool(row['is_correct'])} for row in rows]
+
+
+def get_report(kind, learner_id=ALL_LEARNERS, word=None, limit=REPORT_PAGE_SIZE, cursor=None):
+    """Страница отчёта, отсортированная по числу ошибок; cursor — ключ последней строки"""
+    limit = max(1, min(limit, REPORT_MAX_PAGE_SIZE))
+
+    with get_db() as conn:
+        if kind == 'letters':
+            # Букв немного, поэтому агрегируем сводку позиций целиком
+            rows = conn.execute('''
+                SELECT letter, SUM(errors) AS errors
+                FROM stats_positions
+                WHERE learner_id = ?
+                GROUP BY letter
+                ORDER BY errors DESC, letter
+            ''', (learner_id,)).fetchall()
+            return {'items': [dict(row) for row in rows], 'next_cursor': None}
+
+        if kind not in REPORTS:
+            raise ValueError(f"Неизвестный отчёт: '{kind}'")
+
+        query, key = REPORTS[kind]
+        params = [learner_id]
+
+        if word and kind in ('words', 'positions'):
+            query += ' AND word = ?'
+            params.append(word)
+
+        # Курсор по составному ключу: следующая страница начинается строго после него
+        if cursor:
+            values = json.loads(cursor)
+            if len(values) != len(key):
+                raise ValueError('Некорректный курсор')
+            query += f" AND ({', '.join(key)}) < ({', '.join('?' * len(key))})"
+            params.extend(values)
+
+        query += ' ORDER BY ' + ', '.join(f'{column} DESC' for column in key) + ' LIMIT ?'
+        params.append(limit + 1)
+
+        rows = [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = json.dumps([last[column.split('.')[-1]] for column in key], ensure_ascii=False)
+
+    for row in rows:
+        if 'attempts' in row:
+            row['error_rate'] = row['errors'] / row['attempts'] if row['attempts'] else 0
+
+    return {'items': rows, 'next_cursor': next_cursor}
@@ -1,38 +1,265 @@
-from flask import Flask, render_template, request, jsonify, session, send_file
-from gtts import gTTS
+from flask import (
+    Flask, Response, g, render_template, request, jsonify, session, send_file,
+    stream_with_context
+)
 import os
+import io
 import json
 import random
 from datetime import datetime
+import math
 import secrets
+import threading
+import database
 from database import (
-    init_database, get_categories, get_letters,
-    get_words_by_filters, get_words_count_by_letter
+    SCHEMA_VERSION, UnknownTenantError, init_database, get_schema_version
+)
+from snapshot import get_snapshot
+from export import export_attempts
+from analytics import (
+    ALL_LEARNERS, REPORT_PAGE_SIZE, get_report, get_session_results, record_attempt
+)
+from tts import DEFAULT_LOCAL_COMMAND, create_backend
+from rate_limit import AdmissionController, RateLimited
+from audio import (
+    OPUS_MIMETYPE, AudioProcessingError, postprocess_audio, variant_path
 )
 
 app = Flask(__name__)
-app.secret_key = secrets.token_hex(16)
+# Общий ключ нужен, чтобы сессию понимали все воркеры gunicorn
+app.secret_key = os.environ.get('SECRET_KEY') or secrets.token_hex(16)
 app.config['UPLOAD_FOLDER'] = 'audio_cache'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
-# Создаем папку для аудио, если её нет
-if not os.path.exists(app.config['UPLOAD_FOLDER']):
-    os.makedirs(app.config['UPLOAD_FOLDER'])
+# Ленивый старт: схему мигрирует `python manage.py migrate`, воркеры её только проверяют
+app.config['LAZY_STARTUP'] = os.environ.get('LAZY_STARTUP', '0') == '1'
+
+# Снимок словаря в памяти: чтение слов без запросов к SQLite
+app.config['WORD_SNAPSHOT'] = os.environ.get('WORD_SNAPSHOT', '0') == '1'
+# Как часто (в секундах) проверять, изменились ли данные словаря; 0 — не перечитывать
+app.config['SNAPSHOT_RELOAD_INTERVAL'] = float(os.environ.get('SNAPSHOT_RELOAD_INTERVAL', 1))
+
+# Отдельная база для каждой школы: папка с файлами <школа>.db; пусто — одна общая база
+app.config['TENANT_DATABASES_DIR'] = os.environ.get('TENANT_DATABASES_DIR', '')
+# Школа берётся из заголовка (его выставляет прокси) или из поддомена: school1.<суффикс>
+app.config['TENANT_HEADER'] = os.environ.get('TENANT_HEADER', 'X-School')
+app.config['TENANT_HOST_SUFFIX'] = os.environ.get('TENANT_HOST_SUFFIX', '')
+app.config['TENANT_DEFAULT'] = os.environ.get('TENANT_DEFAULT', '')
+# Сколько баз школ держать открытыми в одном воркере и сколько секунд хранить простаивающие
+app.config['TENANT_MAX_OPEN'] = int(os.environ.get('TENANT_MAX_OPEN', 32))
+app.config['TENANT_IDLE_SECONDS'] = float(os.environ.get('TENANT_IDLE_SECONDS', 300))
+
+# Токен для выгрузки попыток и отчётов по всем ученикам (заголовок X-Admin-Token);
+# пусто — выгрузка доступна только через python manage.py export
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN', '')
+
+# Списки слов сессий хранятся на сервере, в cookie — только идентификатор
+app.config['MAX_SESSION_WORDS'] = int(os.environ.get('MAX_SESSION_WORDS', 500))
+app.config['MAX_WORD_LINE_LENGTH'] = 200
+app.config['WORD_LIST_TTL_DAYS'] = 7
+
+# Настройки синтеза речи: gtts, local (espeak-ng, RHVoice) или fake
+app.config['TTS_BACKEND'] = os.environ.get('TTS_BACKEND', 'gtts')
+app.config['TTS_TIMEOUT'] = float(os.environ.get('TTS_TIMEOUT', 10))
+app.config['TTS_MAX_CONCURRENCY'] = int(os.environ.get('TTS_MAX_CONCURRENCY', 0)) or None
+app.config['TTS_LOCAL_COMMAND'] = os.environ.get('TTS_LOCAL_COMMAND', DEFAULT_LOCAL_COMMAND)
+app.config['TTS_LOCAL_FORMAT'] = os.environ.get('TTS_LOCAL_FORMAT', 'wav')
+app.config['TTS_FAKE_DELAY'] = float(os.environ.get('TTS_FAKE_DELAY', 0))
+app.config['TTS_BATCH_MAX_WORDS'] = 50
+app.config['TTS_MAX_TEXT_LENGTH'] = 100
+app.config['TTS_LANGUAGES'] = ('ru', 'en')
+
+# Допуск синтеза (на процесс): лимиты токенов, одновременные синтезы и очередь
+app.config['TTS_SESSION_RATE'] = float(os.environ.get('TTS_SESSION_RATE', 1))
+app.config['TTS_SESSION_BURST'] = int(os.environ.get('TTS_SESSION_BURST', 50))
+app.config['TTS_GLOBAL_RATE'] = float(os.environ.get('TTS_GLOBAL_RATE', 20))
+app.config['TTS_GLOBAL_BURST'] = int(os.environ.get('TTS_GLOBAL_BURST', 200))
+app.config['TTS_MAX_CONCURRENT'] = int(os.environ.get('TTS_MAX_CONCURRENT', 8))
+app.config['TTS_MAX_QUEUE'] = int(os.environ.get('TTS_MAX_QUEUE', 16))
+app.config['TTS_QUEUE_TIMEOUT'] = float(os.environ.get('TTS_QUEUE_TIMEOUT', 5))
+
+# Постобработка аудио (нужен ffmpeg с libopus): обрезка тишины, громкость, Opus/WebM
+app.config['AUDIO_POSTPROCESS'] = os.environ.get('AUDIO_POSTPROCESS', '0') == '1'
+app.config['AUDIO_FFMPEG'] = os.environ.get('AUDIO_FFMPEG', 'ffmpeg')
+app.config['AUDIO_OPUS_BITRATE'] = os.environ.get('AUDIO_OPUS_BITRATE', '24k')
+app.config['AUDIO_LOUDNESS'] = float(os.environ.get('AUDIO_LOUDNESS', -16))
+
+AUDIO_MIMETYPES = {
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.ogg': 'audio/ogg',
+    '.webm': OPUS_MIMETYPE,
+}
+
+_tts_backend = None
+_tts_backend_lock = threading.Lock()
+_admission = None
+# Школы (None — общая база), схема которых уже проверена
+_schema_checked = set()
+
+if app.config['TENANT_DATABASES_DIR']:
+    database.configure_tenants(
+        app.config['TENANT_DATABASES_DIR'],
+        max_tenants=app.config['TENANT_MAX_OPEN'],
+        idle_seconds=app.config['TENANT_IDLE_SECONDS']
+    )
+
+
+def get_tts_backend():
+    """Ленивое создание TTS-бэкенда и папки кэша при первом обращении"""
+    global _tts_backend
+    if _tts_backend is None:
+        with _tts_backend_lock:
+            if _tts_backend is None:
+                # Создаем папку для аудио, если её нет
+                os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+                backend = create_backend(app.config)
+                if app.config['AUDIO_POSTPROCESS']:
+                    backend.postprocessors.append(postprocess_cached_audio)
+                _tts_backend = backend
+    return _tts_backend
+
+
+def get_admission():
+    """Ленивое создание контроллера допуска синтеза"""
+    global _admission
+    if _admission is None:
+        with _tts_backend_lock:
+            if _admission is None:
+                _admission = AdmissionController(
+                    session_rate=app.config['TTS_SESSION_RATE'],
+                    session_burst=app.config['TTS_SESSION_BURST'],
+                    global_rate=app.config['TTS_GLOBAL_RATE'],
+                    global_burst=app.config['TTS_GLOBAL_BURST'],
+                    max_concurrent=app.config['TTS_MAX_CONCURRENT'],
+                    max_queue=app.config['TTS_MAX_QUEUE'],
+                    queue_timeout=app.config['TTS_QUEUE_TIMEOUT']
+                )
+    return _admission
+
+
+def _reset_after_fork():
+    """Сброс состояния, которое нельзя наследовать от предзагруженного мастера"""
+    global _tts_backend, _tts_backend_lock, _admission
+    # Пулы потоков и блокировки родителя в дочернем процессе не работают
+    _tts_backend = None
+    _tts_backend_lock = threading.Lock()
+    _admission = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def postprocess_cached_audio(filepath):
+    """Постобработка нового аудиофайла; при ошибке остаётся исходный файл"""
+    try:
+        postprocess_audio(
+            filepath,
+            ffmpeg=app.config['AUDIO_FFMPEG'],
+            bitrate=app.config['AUDIO_OPUS_BITRATE'],
+            loudness=app.config['AUDIO_LOUDNESS'],
+            timeout=app.config['TTS_TIMEOUT']
+        )
+    except AudioProcessingError as e:
+        print(f"⚠️ Постобработка {os.path.basename(filepath)} не удалась: {e}")
+
+
+if not app.config['LAZY_STARTUP']:
+    # Инициализируем базу данных при старте (если схема актуальна — только чтение версии)
+    init_database()
+    _schema_checked.add(None)
+    if app.config['WORD_SNAPSHOT']:
+        get_snapshot(app.config['SNAPSHOT_RELOAD_INTERVAL'])
+
+
+def request_tenant():
+    """Школа запроса: из поддомена, из заголовка или школа по умолчанию"""
+    # Суффикс «example.org» и «.example.org» означают одно и то же
+    suffix = app.config['TENANT_HOST_SUFFIX'].lower()
+    if suffix and not suffix.startswith('.'):
+        suffix = '.' + suffix
+    host = request.host.split(':')[0].lower()
+    if suffix and host.endswith(suffix) and len(host) > len(suffix):
+        return host[:-len(suffix)]
+    return (request.headers.get(app.config['TENANT_HEADER']) or app.config['TENANT_DEFAULT']).lower()
+
+
+@app.before_request
+def resolve_tenant():
+    """Выбор базы школы для запроса"""
+    if not app.config['TENANT_DATABASES_DIR'] or request.endpoint == 'static':
+        return
+
+    tenant = request_tenant()
+    if not tenant:
+        return jsonify({'success': False, 'error': 'Не указана школа'}), 404
+
+    # Базы создаются только командой manage.py tenant-create: Host и заголовки задаёт клиент
+    try:
+        g.tenant_token = database.set_current_tenant(tenant)
+    except UnknownTenantError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+
+    # Сессия из другой школы ссылается на чужие списки слов — начинаем заново
+    if session.get('tenant', tenant) != tenant:
+        session.clear()
+    session['tenant'] = tenant
+
+
+@app.teardown_request
+def release_tenant(error=None):
+    """Сброс школы: поток gunicorn обслужит следующий запрос другой школы"""
+    token = g.pop('tenant_token', None)
+    if token is not None:
+        database.reset_current_tenant(token)
+
+
+@app.before_request
+def check_schema():
+    """Однократная проверка версии схемы общей базы и базы школы в ленивом режиме"""
+    for tenant in (None, database.get_current_tenant()):
+        if tenant in _schema_checked:
+            continue
+
+        token = database.set_current_tenant(tenant)
+        try:
+            version = get_schema_version()
+        finally:
+            database.reset_current_tenant(token)
+
+        if version < SCHEMA_VERSION:
+            command = f'python manage.py migrate --tenant {tenant}' if tenant else 'python manage.py migrate'
+            return jsonify({
+                'success': False,
+                'error': f'Схема БД устарела (версия {version}, нужна {SCHEMA_VERSION}): '
+                         f'выполните {command}'
+            }), 503
+        _schema_checked.add(tenant)
+
+
+def words_source():
+    """Источник словаря: снимок в памяти или запросы к БД"""
+    if app.config['WORD_SNAPSHOT']:
+        return get_snapshot(app.config['SNAPSHOT_RELOAD_INTERVAL'])
+    return database
+
 
-# Инициализируем базу данных при старте
-init_database()
+def reset_session_stats():
+    """Новые счётчики сессии; ответы хранятся в БД (attempts), в cookie — только их идентификатор"""
+    session['stats'] = {
+        'total_attempts': 0,
+        'correct_attempts': 0
+    }
+    session['results_id'] = secrets.token_hex(8)
 
 
 def init_session():
     """Инициализация сессии пользователя"""
+    if 'learner_id' not in session:
+        session['learner_id'] = secrets.token_hex(8)
     if 'stats' not in session:
-        session['stats'] = {
-            'total_attempts': 0,
-            'correct_attempts': 0,
-            'session_results': []
-        }
-    if 'word_pairs' not in session:
-        session['word_pairs'] = []
+        reset_session_stats()
     if 'current_index' not in session:
         session['current_index'] = 0
 
@@ -49,7 +276,7 @@ def api_get_categories():
     """Получение списка категорий"""
     try:
         category_type = request.args.get('type', None)
-        categories = get_categories(category_type)
+        categories = words_source().get_categories(category_type)
         return jsonify({'success': True, 'categories': categories})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -60,7 +287,7 @@ def api_get_letters():
     """Получение списка букв с количеством слов"""
     try:
         category_id = request.args.get('category_id', None, type=int)
-        letters = get_words_count_by_letter(category_id)
+        letters = words_source().get_words_count_by_letter(category_id)
         return jsonify({'success': True, 'letters': letters})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -74,16 +301,14 @@ def count_words():
         category_ids = data.get('category_ids', [])
         mode = data.get('mode', 'ru_only')
 
-        # Получаем слова из БД
-        words = get_words_by_filters(category_ids, None)
-
-        # Фильтруем слова с переводом для режимов перевода
-        if mode != 'ru_only':
-            words = [w for w in words if w['english_word']]
+        # Для режимов перевода считаем только слова с переводом
+        count = words_source().count_words_by_filters(
+            category_ids, None, with_translation=mode != 'ru_only'
+        )
 
         return jsonify({
             'success': True,
-            'count': len(words)
+            'count': count
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
@@ -98,35 +323,29 @@ def get_words_from_db():
         letter_ids = data.get('letter_ids', [])
         mode = data.get('mode', 'ru_only')
 
-        # Получаем слова из БД
-        words = get_words_by_filters(category_ids, letter_ids)
+        # Случайная выборка сразу нужного размера, без чтения всех слов
+        source = words_source()
+        words = source.sample_words(
+            app.config['MAX_SESSION_WORDS'], category_ids, letter_ids,
+            with_translation=(mode != 'ru_only')
+        )
 
         if not words:
-            return jsonify({'success': False, 'error': 'Нет слов по выбранным фильтрам'})
-
-        # Формируем пары слов в зависимости от режима
-        word_pairs = []
-        for word in words:
-            if mode == 'ru_only':
-                word_pairs.append((word['russian_word'], None))
-            else:
-                if word['english_word']:
-                    word_pairs.append((word['russian_word'], word['english_word']))
-
-        if not word_pairs:
+            if not source.count_words_by_filters(category_ids, letter_ids):
+                return jsonify({'success': False, 'error': 'Нет слов по выбранным фильтрам'})
             return jsonify({'success': False, 'error': 'Нет подходящих слов для выбранного режима'})
 
-        # Перемешиваем слова
-        random.shuffle(word_pairs)
+        # Формируем пары слов в зависимости от режима
+        if mode == 'ru_only':
+            word_pairs = [(word['russian_word'], None) for word in words]
+        else:
+            word_pairs = [(word['russian_word'], word['english_word']) for word in words]
 
-        session['word_pairs'] = word_pairs
+        # Версия словаря нужна, чтобы обновить список после перезагрузки данных
+        store_word_pairs(word_pairs, getattr(source, 'fingerprint', None))
         session['current_index'] = 0
         session['mode'] = mode
-        session['stats'] = {
-            'total_attempts': 0,
-            'correct_attempts': 0,
-            'session_results': []
-        }
+        reset_session_stats()
 
         return jsonify({
             'success': True,
@@ -143,32 +362,69 @@ def save_words():
         data = request.json
         words_text = data.get('words', '')
         mode = data.get('mode', 'ru_only')
+        size = data.get('size')
 
-        word_pairs = parse_word_pairs(words_text, mode)
-
-        if not word_pairs:
-            return jsonify({'success': False, 'error': 'Нет валидных слов'})
+        return start_manual_session(io.StringIO(words_text), mode, size)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
 
-        # Перемешиваем слова
-        random.shuffle(word_pairs)
 
-        session['word_pairs'] = word_pairs
-        session['current_index'] = 0
-        session['mode'] = mode
-        session['stats'] = {
-            'total_attempts': 0,
-            'correct_attempts': 0,
-            'session_results': []
-        }
-
-        return jsonify({
-            'success': True,
-            'total_words': len(word_pairs)
-        })
+@app.route('/api/upload_words', methods=['POST'])
+def upload_words():
+    """Потоковая загрузка списка слов из файла или тела запроса (в том числе chunked)"""
+    try:
+        mode = request.args.get('mode', 'ru_only')
+        size = request.args.get('size')
+
+        # Файл из формы или «сырое» тело запроса читаются построчно, целиком в память не попадают.
+        # request.form трогаем только для multipart: иначе Werkzeug прочитает тело
+        # (например, от curl --data-binary) как форму и строки пропадут
+        upload = None
+        if request.mimetype == 'multipart/form-data':
+            mode = request.form.get('mode', mode)
+            size = request.form.get('size', size)
+            upload = request.files.get('file')
+        stream = upload.stream if upload else request.stream
+        lines = (raw_line.decode('utf-8', 'replace') for raw_line in stream)
+
+        return start_manual_session(lines, mode, size)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
+def start_manual_session(lines, mode, size=None):
+    """Разбор строк со словами и запуск сессии со случайной выборкой из них"""
+    max_words = app.config['MAX_SESSION_WORDS']
+    if size in (None, ''):
+        size = max_words
+    else:
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            size = 0
+        if size <= 0:
+            return jsonify({'success': False, 'error': 'Размер выборки должен быть целым числом больше нуля'})
+    size = min(size, max_words)
+
+    stats = {'parsed': 0, 'rejected': 0, 'duplicates': 0}
+    word_pairs = sample_unique_pairs(iter_word_pairs(lines, mode, stats), size, stats)
+
+    if not word_pairs:
+        return jsonify({'success': False, 'error': 'Нет валидных слов', **stats})
+
+    store_word_pairs(word_pairs)
+    session['current_index'] = 0
+    session['mode'] = mode
+    reset_session_stats()
+
+    return jsonify({
+        'success': True,
+        'total_words': len(word_pairs),
+        'kept': len(word_pairs),
+        **stats
+    })
+
+
 @app.route('/api/generate_audio', methods=['POST'])
 def generate_audio():
     """Генерация аудиофайла для слова"""
@@ -177,29 +433,24 @@ def generate_audio():
         word = data.get('word', '')
         lang = data.get('lang', 'ru')
 
-        if not word:
-            return jsonify({'success': False, 'error': 'Слово не указано'})
+        error = validate_tts_text(word, lang)
+        if error:
+            return jsonify({'success': False, 'error': error})
 
-        # Создаем безопасное имя файла
-        safe_filename = make_safe_filename(word)
-        filename = f"{safe_filename}_{lang}.mp3"
+        filename = make_audio_filename(word, lang)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
 
-        # Если файл уже существует, возвращаем его
-        if os.path.exists(filepath):
-            return jsonify({
-                'success': True,
-                'audio_url': f'/audio/{filename}'
-            })
-
-        # Генерируем аудио
-        tts = gTTS(text=word, lang=lang)
-        tts.save(filepath)
+        # Если файла ещё нет, генерируем аудио; попадания в кэш лимиты не расходуют
+        if not os.path.exists(filepath):
+            with get_admission().admit(tts_client_key()):
+                get_tts_backend().synthesize(word, lang, filepath)
 
         return jsonify({
             'success': True,
             'audio_url': f'/audio/{filename}'
         })
+    except RateLimited as e:
+        return rate_limited_response(e)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -207,13 +458,85 @@ def generate_audio():
         })
 
 
+@app.route('/api/generate_audio_batch', methods=['POST'])
+def generate_audio_batch():
+    """Пакетная генерация аудиофайлов для нескольких слов"""
+    try:
+        data = request.json
+        words = data.get('words', [])
+        default_lang = data.get('lang', 'ru')
+
+        if not words:
+            return jsonify({'success': False, 'error': 'Слова не указаны'})
+        if len(words) > app.config['TTS_BATCH_MAX_WORDS']:
+            return jsonify({
+                'success': False,
+                'error': f"Не больше {app.config['TTS_BATCH_MAX_WORDS']} слов за запрос"
+            })
+
+        # Слово может быть строкой или объектом {word, lang}
+        items = []
+        for item in words:
+            if isinstance(item, dict):
+                items.append((item.get('word', ''), item.get('lang', default_lang)))
+            else:
+                items.append((item, default_lang))
+
+        audio = []
+        to_synthesize = []
+        for word, lang in items:
+            error = validate_tts_text(word, lang)
+            if error:
+                audio.append({'word': word, 'lang': lang, 'error': error})
+                continue
+            filename = make_audio_filename(word, lang)
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            entry = {'word': word, 'lang': lang, 'audio_url': f'/audio/{filename}'}
+            audio.append(entry)
+            if not os.path.exists(filepath):
+                to_synthesize.append((entry, filepath))
+
+        # Синтезируем только отсутствующие в кэше слова, параллельно;
+        # токены списываются за весь пакет, а слот занимает каждый синтез
+        if to_synthesize:
+            batch = get_admission().batch(tts_client_key(), tokens=len(to_synthesize))
+            errors = get_tts_backend().synthesize_batch(
+                [(entry['word'], entry['lang'], filepath) for entry, filepath in to_synthesize],
+                guard=batch.slot
+            )
+            # Отказ в слоте — перегрузка: весь пакет получает 429, уже готовые файлы
+            # останутся в кэше и при повторе лимиты не расходуют
+            if batch.refused is not None:
+                raise batch.refused
+            for entry, filepath in to_synthesize:
+                if errors.get(filepath):
+                    entry['error'] = errors[filepath]
+                    del entry['audio_url']
+
+        return jsonify({'success': True, 'audio': audio})
+    except RateLimited as e:
+        return rate_limited_response(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
 @app.route('/audio/<filename>')
 def serve_audio(filename):
     """Отдача аудиофайлов"""
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    if os.path.exists(filepath):
-        return send_file(filepath, mimetype='audio/mpeg')
-    return "File not found", 404
+    if not os.path.exists(filepath):
+        return "File not found", 404
+
+    # Клиентам, явно принимающим Opus/WebM, отдаём компактный вариант
+    opus_path = variant_path(filepath)
+    if opus_path != filepath and accepts_mimetype(OPUS_MIMETYPE) and os.path.exists(opus_path):
+        filepath = opus_path
+
+    mimetype = AUDIO_MIMETYPES.get(os.path.splitext(filepath)[1], 'audio/mpeg')
+    # send_file считает относительные пути от папки приложения, а не от текущей
+    response = send_file(os.path.abspath(filepath), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
 
 
 @app.route('/api/get_current_word', methods=['GET'])
@@ -222,7 +545,7 @@ def get_current_word():
     try:
         init_session()
 
-        word_pairs = session.get('word_pairs', [])
+        word_pairs = load_word_pairs()
         current_index = session.get('current_index', 0)
         mode = session.get('mode', 'ru_only')
 
@@ -269,7 +592,7 @@ def check_answer():
         data = request.json
         user_answer = data.get('answer', '').strip()
 
-        word_pairs = session.get('word_pairs', [])
+        word_pairs = load_word_pairs()
         current_index = session.get('current_index', 0)
         mode = session.get('mode', 'ru_only')
 
@@ -297,15 +620,18 @@ def check_answer():
         if is_correct:
             stats['correct_attempts'] += 1
 
-        stats['session_results'].append({
-            'heard_word': heard_word,
-            'correct_word': correct_word,
-            'user_answer': user_answer,
-            'is_correct': is_correct
-        })
-
         session['stats'] = stats
 
+        # Попытка нужна и для экрана результатов, но её ошибка не должна мешать тренировке
+        try:
+            record_attempt(
+                session['learner_id'], mode, russian_word,
+                heard_word, correct_word, user_answer, is_correct,
+                session_id=session.get('results_id')
+            )
+        except Exception as e:
+            print(f"⚠️ Не удалось сохранить попытку: {e}")
+
         # Переходим к следующему слову
         session['current_index'] = current_index + 1
 
@@ -332,7 +658,11 @@ def get_results():
         init_session()
 
         stats = session.get('stats', {})
-        word_pairs = session.get('word_pairs', [])
+        word_pairs = load_word_pairs()
+
+        # Ответы по словам читаются из БД: в cookie при длинных сессиях они не помещались
+        results_id = session.get('results_id')
+        session_results = get_session_results(results_id) if results_id else []
 
         total_words = len(word_pairs)
         correct_count = stats.get('correct_attempts', 0)
@@ -351,60 +681,187 @@ def get_results():
             grade = 1
 
         return jsonify({
+            'learner_id': session.get('learner_id'),
             'grade': grade,
             'total_words': total_words,
             'correct_count': correct_count,
             'errors_count': total_words - correct_count,
             'percentage': percentage,
-            'session_results': stats.get('session_results', [])
+            'session_results': session_results
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
+@app.route('/api/analytics/report', methods=['GET'])
+def analytics_report():
+    """Отчёт об ошибках: по словам, позициям букв, буквам или категориям"""
+    # Ученику доступен только свой отчёт, сводка и чужие отчёты — администратору
+    if is_admin_request():
+        learner_id = request.args.get('learner_id', ALL_LEARNERS)
+    else:
+        learner_id = session.get('learner_id')
+        if not learner_id or request.args.get('learner_id', learner_id) != learner_id:
+            return jsonify({'success': False, 'error': 'Отчёт доступен только администратору'}), 403
+
+    try:
+        report = get_report(
+            request.args.get('kind', 'words'),
+            learner_id=learner_id,
+            word=request.args.get('word'),
+            limit=request.args.get('limit', REPORT_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor')
+        )
+        return jsonify({'success': True, **report})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+
+@app.route('/api/export/attempts', methods=['GET'])
+def export_attempts_view():
+    """Потоковая выгрузка попыток в CSV или JSONL"""
+    if not is_admin_request():
+        return jsonify({'success': False, 'error': 'Выгрузка доступна только администратору'}), 403
+
+    try:
+        fmt = request.args.get('format', 'csv')
+        compress = request.args.get('gzip') == '1'
+        parts = export_attempts(
+            fmt,
+            compress=compress,
+            learner_id=request.args.get('learner_id'),
+            category_id=request.args.get('category_id', type=int),
+            date_from=request.args.get('date_from'),
+            date_to=request.args.get('date_to')
+        )
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+    filename = f'attempts.{fmt}'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    # Тело отдаётся порциями (chunked), не собираясь в памяти
+    return Response(
+        stream_with_context(parts),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
 @app.route('/api/reset_session', methods=['POST'])
 def reset_session():
     """Сброс текущей сессии"""
     try:
         session['current_index'] = 0
-        session['stats'] = {
-            'total_attempts': 0,
-            'correct_attempts': 0,
-            'session_results': []
-        }
+        reset_session_stats()
 
         # Перемешиваем слова заново
-        word_pairs = session.get('word_pairs', [])
-        random.shuffle(word_pairs)
-        session['word_pairs'] = word_pairs
+        word_pairs = list(load_word_pairs())
+        if word_pairs:
+            random.shuffle(word_pairs)
+            store_word_pairs(word_pairs, session.get('dictionary_version'))
 
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
 
-def parse_word_pairs(text, mode):
-    """Парсинг пар слов из текста"""
-    pairs = []
-
-    for line in text.strip().split('\n'):
+def store_word_pairs(word_pairs, dictionary_version=None):
+    """Сохранение списка слов сессии на сервере"""
+    session['word_list_id'] = database.save_word_list(
+        word_pairs, ttl_days=app.config['WORD_LIST_TTL_DAYS']
+    )
+    session.pop('word_pairs', None)
+    if dictionary_version:
+        session['dictionary_version'] = dictionary_version
+    else:
+        session.pop('dictionary_version', None)
+
+
+def load_word_pairs():
+    """Список слов текущей сессии"""
+    list_id = session.get('word_list_id')
+    if list_id:
+        word_pairs = database.load_word_list(list_id)
+        if session.get('dictionary_version'):
+            word_pairs = refresh_stale_word_pairs(word_pairs)
+        return word_pairs
+    # Сессии, начатые до переноса списков на сервер
+    return [tuple(pair) for pair in session.get('word_pairs', [])]
+
+
+def refresh_stale_word_pairs(word_pairs):
+    """Обновление оставшихся слов сессии, если словарь перезагрузили после её начала"""
+    snapshot = words_source()
+    version = getattr(snapshot, 'fingerprint', None)
+    if version is None or version == session['dictionary_version']:
+        return word_pairs
+
+    # Пройденные слова не трогаем, чтобы не сбить номер текущего
+    current_index = session.get('current_index', 0)
+    word_pairs = list(word_pairs[:current_index]) + snapshot.refresh_word_pairs(word_pairs[current_index:])
+    store_word_pairs(word_pairs, version)
+    return word_pairs
+
+
+def iter_word_pairs(lines, mode, stats=None):
+    """Построчный разбор пар слов; stats собирает число разобранных и отброшенных строк"""
+    if stats is None:
+        stats = {'parsed': 0, 'rejected': 0}
+    max_length = app.config['MAX_WORD_LINE_LENGTH']
+
+    for line in lines:
         line = line.strip()
         if not line:
             continue
+        stats['parsed'] += 1
+
+        if len(line) > max_length:
+            stats['rejected'] += 1
+            continue
 
         if mode == 'ru_only':
-            pairs.append((line, None))
+            yield line, None
         else:
             if '-' not in line:
+                stats['rejected'] += 1
                 continue
             parts = line.split('-', 1)
-            if len(parts) == 2:
-                russian = parts[0].strip()
-                english = parts[1].strip()
-                if russian and english:
-                    pairs.append((russian, english))
+            russian = parts[0].strip()
+            english = parts[1].strip()
+            if russian and english:
+                yield russian, english
+            else:
+                stats['rejected'] += 1
+
+
+def sample_unique_pairs(pairs, size, stats):
+    """Удаление повторов и случайная выборка size пар за один проход (reservoir sampling)"""
+    seen = set()
+    reservoir = []
+    unique = 0
+
+    for pair in pairs:
+        key = (pair[0].lower(), (pair[1] or '').lower())
+        if key in seen:
+            stats['duplicates'] += 1
+            continue
+        seen.add(key)
+        unique += 1
+
+        if len(reservoir) < size:
+            reservoir.append(pair)
+        else:
+            j = random.randrange(unique)
+            if j < size:
+                reservoir[j] = pair
 
-    return pairs
+    # Первые size пар лежат в порядке ввода — перемешиваем
+    random.shuffle(reservoir)
+    return reservoir
 
 
 def make_safe_filename(word):
@@ -414,6 +871,53 @@ def make_safe_filename(word):
     return safe_filename[:50]  # Ограничиваем длину
 
 
+def validate_tts_text(word, lang):
+    """Проверка текста и языка перед синтезом; возвращает текст ошибки или None"""
+    if not word:
+        return 'Слово не указано'
+    if len(word) > app.config['TTS_MAX_TEXT_LENGTH']:
+        return f"Слишком длинный текст (не больше {app.config['TTS_MAX_TEXT_LENGTH']} символов)"
+    if word.lstrip().startswith('-'):
+        return 'Текст не может начинаться с дефиса'
+    if lang not in app.config['TTS_LANGUAGES']:
+        return f"Неподдерживаемый язык: '{lang}'"
+    return None
+
+
+def is_admin_request():
+    """Передан ли в запросе токен администратора"""
+    token = app.config['ADMIN_TOKEN']
+    supplied = request.headers.get('X-Admin-Token', '')
+    return bool(token) and secrets.compare_digest(supplied.encode(), token.encode())
+
+
+def tts_client_key():
+    """Ключ клиента для лимитов синтеза: ученик из сессии или IP-адрес"""
+    return session.get('learner_id') or request.remote_addr
+
+
+def rate_limited_response(error):
+    """Быстрый ответ 429 с заголовком Retry-After"""
+    retry_after = 60 if math.isinf(error.retry_after) else max(1, math.ceil(error.retry_after))
+    response = jsonify({'success': False, 'error': error.reason, 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def accepts_mimetype(mimetype):
+    """Явно ли клиент указал тип в Accept (без учёта */*)"""
+    for value, quality in request.accept_mimetypes:
+        if value.split(';')[0].strip() == mimetype and quality > 0:
+            return True
+    return False
+
+
+def make_audio_filename(word, lang):
+    """Имя файла в кэше аудио для слова и языка"""
+    return f"{make_safe_filename(word)}_{lang}.{get_tts_backend().extension}"
+
+
 if __name__ == '__main__':
     app.run(
         debug=True,
@@ -0,0 +1,103 @@
+"""
+Постобработка аудио после синтеза: обрезка тишины, нормализация громкости
+и компактный Opus/WebM-вариант рядом с исходным файлом
+"""
+
+import os
+import subprocess
+import sys
+import uuid
+
+OPUS_EXTENSION = '.webm'
+OPUS_MIMETYPE = 'audio/webm'
+
+SOURCE_EXTENSIONS = ('.mp3', '.wav', '.ogg')
+
+
+class AudioProcessingError(Exception):
+    """Ошибка постобработки аудио"""
+
+
+def variant_path(filepath):
+    """Путь к Opus/WebM-варианту аудиофайла"""
+    return os.path.splitext(filepath)[0] + OPUS_EXTENSION
+
+
+def build_filter(silence_threshold='-50dB', loudness=-16.0):
+    """Цепочка фильтров ffmpeg: тишина в начале и в конце, затем нормализация громкости"""
+    trim = f'silenceremove=start_periods=1:start_threshold={silence_threshold}'
+    return ','.join([
+        trim,
+        'areverse',
+        trim,
+        'areverse',
+        f'loudnorm=I={loudness}:TP=-1.5:LRA=11',
+        # loudnorm повышает частоту до 192 кГц, Opus работает с 48 кГц
+        'aresample=48000',
+    ])
+
+
+def postprocess_audio(filepath, ffmpeg='ffmpeg', bitrate='24k', loudness=-16.0,
+                      normalize_source=True, timeout=10.0):
+    """Обработка аудиофайла: Opus/WebM-вариант и (опционально) нормализованный исходник"""
+    tmp_suffix = uuid.uuid4().hex
+    source_ext = os.path.splitext(filepath)[1]
+    tmp_variant = f'{variant_path(filepath)}.{tmp_suffix}{OPUS_EXTENSION}'
+    tmp_source = f'{filepath}.{tmp_suffix}{source_ext}'
+
+    # Один проход ffmpeg: фильтры применяются один раз, результат делится на два выхода
+    filter_graph = f'[0:a]{build_filter(loudness=loudness)}'
+    if normalize_source:
+        filter_graph += ',asplit=2[opus][src]'
+    else:
+        filter_graph += '[opus]'
+
+    args = [
+        ffmpeg, '-hide_banner', '-loglevel', 'error', '-y',
+        '-i', filepath,
+        '-filter_complex', filter_graph,
+        '-map', '[opus]', '-ac', '1', '-c:a', 'libopus', '-b:a', bitrate,
+        '-application', 'voip', tmp_variant,
+    ]
+    if normalize_source:
+        args += ['-map', '[src]', '-ac', '1', tmp_source]
+
+    try:
+        subprocess.run(args, check=True, capture_output=True, timeout=timeout)
+        os.replace(tmp_variant, variant_path(filepath))
+        if normalize_source:
+            os.replace(tmp_source, filepath)
+    except subprocess.TimeoutExpired:
+        raise AudioProcessingError(f'Превышено время обработки ({timeout} с)')
+    except subprocess.CalledProcessError as e:
+        message = e.stderr.decode('utf-8', 'replace').strip()
+        raise AudioProcessingError(f'ffmpeg завершился с кодом {e.returncode}: {message}')
+    except FileNotFoundError:
+        raise AudioProcessingError(f'ffmpeg не найден: {ffmpeg}')
+    finally:
+        for path in (tmp_variant, tmp_source):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def process_cache_directory(directory, **kwargs):
+    """Создание недостающих вариантов для уже закэшированных файлов"""
+    processed = 0
+    failed = 0
+    for name in sorted(os.listdir(directory)):
+        filepath = os.path.join(directory, name)
+        if not name.endswith(SOURCE_EXTENSIONS) or os.path.exists(variant_path(filepath)):
+            continue
+        try:
+            postprocess_audio(filepath, **kwargs)
+            processed += 1
+        except AudioProcessingError as e:
+            failed += 1
+            print(f"⚠️ {name}: {e}")
+    return processed, failed
+
+
+if __name__ == '__main__':
+    cache_dir = sys.argv[1] if len(sys.argv) > 1 else 'audio_cache'
+    processed, failed = process_cache_directory(cache_dir)
+    print(f"✅ Обработано файлов: {processed}, с ошибками: {failed}")
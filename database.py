@@ -1,13 +1,169 @@
 import sqlite3
 import os
+import json
+import pathlib
+import random
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
 
 DATABASE_PATH = 'words_database.db'
 
+# Размер пакета при заполнении колонок: короткие транзакции не блокируют читателей WAL
+MIGRATION_BATCH_SIZE = 500
+
+# Базы школ: у каждой свой файл в этой папке, а общий словарь (DATABASE_PATH)
+# подключается к ним только для чтения. None — все школы в одной базе
+TENANT_DATABASES_DIR = None
+TENANT_NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,62}$')
+
+_current_tenant = ContextVar('current_tenant', default=None)
+
+
+class UnknownTenantError(Exception):
+    """База школы не найдена"""
+
+
+def sqlite_uri(path, mode):
+    """URI файла SQLite с экранированным путём (пробелы, %, ? и # в именах папок)"""
+    return f'{pathlib.Path(os.path.abspath(path)).as_uri()}?mode={mode}'
+
+
+class TenantPool:
+    """Соединения с базами школ; базы давно не обращавшихся школ закрываются (LRU)"""
+
+    def __init__(self, max_tenants=32, max_idle_per_tenant=4, idle_seconds=300):
+        self.max_tenants = max_tenants
+        self.max_idle_per_tenant = max_idle_per_tenant
+        self.idle_seconds = idle_seconds
+        self._idle = OrderedDict()
+        self._last_used = {}
+        self._lock = threading.Lock()
+
+    def _open(self, tenant):
+        path = tenant_database_path(tenant)
+        if not os.path.exists(path):
+            raise UnknownTenantError(f"База школы '{tenant}' не найдена")
+
+        # URI нужен и для ATTACH ниже: без uri=True сборки SQLite без SQLITE_USE_URI
+        # приняли бы «file:...?mode=ro» за имя нового пустого файла
+        conn = sqlite3.connect(sqlite_uri(path, 'rw'), uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # Словарь общий и только для чтения: таблицы words, categories и letters,
+        # которых нет в базе школы, SQLite находит в подключённой базе
+        conn.execute('ATTACH DATABASE ? AS base', (sqlite_uri(DATABASE_PATH, 'ro'),))
+        return conn
+
+    def acquire(self, tenant):
+        with self._lock:
+            idle = self._idle.setdefault(tenant, [])
+            conn = idle.pop() if idle else None
+            self._idle.move_to_end(tenant)
+            self._last_used[tenant] = time.monotonic()
+        return conn or self._open(tenant)
+
+    def release(self, tenant, conn):
+        if conn.in_transaction:
+            conn.rollback()
+
+        to_close = []
+        with self._lock:
+            idle = self._idle.setdefault(tenant, [])
+            if len(idle) < self.max_idle_per_tenant:
+                idle.append(conn)
+            else:
+                to_close.append(conn)
+            to_close.extend(self._evict())
+
+        for stale in to_close:
+            stale.close()
+
+    def _evict(self):
+        """Соединения школ сверх лимита и школ, простаивающих дольше idle_seconds"""
+        evicted = []
+        now = time.monotonic()
+        for tenant in list(self._idle):
+            too_many = len(self._idle) > self.max_tenants
+            if not too_many and now - self._last_used.get(tenant, now) < self.idle_seconds:
+                break  # Дальше по порядку LRU только более свежие школы
+            evicted.extend(self._idle.pop(tenant))
+            self._last_used.pop(tenant, None)
+        return evicted
+
+    def close_all(self):
+        with self._lock:
+            connections = [conn for idle in self._idle.values() for conn in idle]
+            self._idle.clear()
+            self._last_used.clear()
+        for conn in connections:
+            conn.close()
+
+
+_tenant_pool = TenantPool()
+
+
+def configure_tenants(directory, max_tenants=32, max_idle_per_tenant=4, idle_seconds=300):
+    """Включение отдельных баз для школ"""
+    global TENANT_DATABASES_DIR, _tenant_pool
+    TENANT_DATABASES_DIR = directory
+    _tenant_pool.close_all()
+    _tenant_pool = TenantPool(max_tenants, max_idle_per_tenant, idle_seconds)
+
+
+def tenant_database_path(tenant):
+    """Путь к файлу базы школы"""
+    if not TENANT_DATABASES_DIR:
+        raise UnknownTenantError('Отдельные базы для школ не настроены')
+    if not TENANT_NAME_PATTERN.match(tenant):
+        raise UnknownTenantError(f"Некорректное имя школы: '{tenant}'")
+    return os.path.join(TENANT_DATABASES_DIR, f'{tenant}.db')
+
+
+def list_tenants():
+    """Школы, у которых есть своя база"""
+    if not TENANT_DATABASES_DIR or not os.path.isdir(TENANT_DATABASES_DIR):
+        return []
+    return sorted(
+        name[:-3] for name in os.listdir(TENANT_DATABASES_DIR)
+        if name.endswith('.db') and TENANT_NAME_PATTERN.match(name[:-3])
+    )
+
+
+def get_current_tenant():
+    """Школа текущего запроса (None — общая база)"""
+    return _current_tenant.get()
+
+
+def set_current_tenant(tenant):
+    """Выбор школы для текущего контекста; возвращает токен для reset_current_tenant"""
+    if tenant is not None and not os.path.exists(tenant_database_path(tenant)):
+        raise UnknownTenantError(f"База школы '{tenant}' не найдена")
+    return _current_tenant.set(tenant)
+
+
+def reset_current_tenant(token):
+    """Возврат к школе, выбранной до set_current_tenant"""
+    _current_tenant.reset(token)
+
 
 @contextmanager
 def get_db():
     """Контекстный менеджер для работы с БД"""
+    tenant = _current_tenant.get()
+    if tenant is not None:
+        # База школы: соединение из пула с подключённым общим словарём
+        conn = _tenant_pool.acquire(tenant)
+        try:
+            yield conn
+        finally:
+            _tenant_pool.release(tenant, conn)
+        return
+
     conn = sqlite3.connect(DATABASE_PATH)
     conn.row_factory = sqlite3.Row
     try:
@@ -16,13 +172,137 @@ def get_db():
         conn.close()
 
 
-def init_database():
-    """Инициализация базы данных"""
-    with get_db() as conn:
-        cursor = conn.cursor()
+def _reset_after_fork():
+    """Соединения родителя нельзя использовать после fork — начинаем с пустого пула"""
+    global _tenant_pool
+    _tenant_pool = TenantPool(
+        _tenant_pool.max_tenants, _tenant_pool.max_idle_per_tenant, _tenant_pool.idle_seconds
+    )
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def canonical_word(word):
+    """Каноническая форма слова для поиска: без регистра и с е вместо ё"""
+    return word.strip().lower().replace('ё', 'е')
+
+
+def random_key():
+    """Случайный ключ строки для выборки без ORDER BY RANDOM()"""
+    return random.getrandbits(62)
 
+
+class Sql:
+    """Шаг миграции: один SQL-оператор"""
+
+    def __init__(self, statement, transactional=True):
+        self.statement = statement
+        # PRAGMA journal_mode нельзя менять внутри транзакции
+        self.transactional = transactional
+
+    def describe(self):
+        return ' '.join(self.statement.split())
+
+    def estimate(self, conn):
+        return 0
+
+    def apply(self, conn, batch_size):
+        if self.transactional:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(self.statement)
+            conn.execute('COMMIT')
+        else:
+            conn.execute(self.statement)
+        return 0, 1
+
+
+class AddColumn:
+    """Шаг миграции: добавление колонки, если её ещё нет"""
+
+    def __init__(self, table, column, definition):
+        self.table = table
+        self.column = column
+        self.definition = definition
+
+    def describe(self):
+        return f'ALTER TABLE {self.table} ADD COLUMN {self.column} {self.definition}'
+
+    def estimate(self, conn):
+        return 0
+
+    def apply(self, conn, batch_size):
+        # Проверка внутри блокирующей транзакции: другой воркер мог добавить колонку
+        # между проверкой и ALTER TABLE
+        conn.execute('BEGIN IMMEDIATE')
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({self.table})')]
+        if self.column not in columns:
+            conn.execute(self.describe())
+        conn.execute('COMMIT')
+        return 0, 1
+
+
+class Backfill:
+    """Шаг миграции: пакетное заполнение колонки значениями, вычисленными в Python"""
+
+    def __init__(self, table, column, source, compute):
+        self.table = table
+        self.column = column
+        self.source = source
+        self.compute = compute
+
+    def describe(self):
+        return f'заполнение {self.table}.{self.column} из {self.source} пакетами'
+
+    def estimate(self, conn):
+        columns = [row[1] for row in conn.execute(f'PRAGMA table_info({self.table})')]
+        if not columns:
+            return 0
+        if self.column not in columns:
+            return conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        return conn.execute(
+            f'SELECT COUNT(*) FROM {self.table} WHERE {self.column} IS NULL'
+        ).fetchone()[0]
+
+    def apply(self, conn, batch_size):
+        rows = 0
+        batches = 0
+        first_id = conn.execute(f'SELECT MIN(id) FROM {self.table}').fetchone()[0]
+        if first_id is None:
+            return rows, batches
+
+        last_id = first_id - 1
+        while True:
+            # Идём по id, чтобы каждый пакет был отдельной короткой транзакцией
+            conn.execute('BEGIN IMMEDIATE')
+            batch = conn.execute(
+                f'SELECT id, {self.source} FROM {self.table} '
+                f'WHERE id > ? AND {self.column} IS NULL ORDER BY id LIMIT ?',
+                (last_id, batch_size)
+            ).fetchall()
+            if not batch:
+                conn.execute('COMMIT')
+                break
+            conn.executemany(
+                f'UPDATE {self.table} SET {self.column} = ? WHERE id = ?',
+                [(self.compute(value), row_id) for row_id, value in batch]
+            )
+            conn.execute('COMMIT')
+            last_id = batch[-1][0]
+            rows += len(batch)
+            batches += 1
+        return rows, batches
+
+
+# Область миграции: словарь есть только в общей базе, данные учеников — и в базах школ
+DICTIONARY = 'dictionary'
+LEARNERS = 'learners'
+
+# Миграции схемы: (версия, область, описание, шаги). Номер применённой версии — в PRAGMA user_version
+MIGRATIONS = [
+    (1, DICTIONARY, 'Базовая схема: категории, буквы, слова', [
         # Таблица категорий (классы, уроки и т.д.)
-        cursor.execute('''
+        Sql('''
             CREATE TABLE IF NOT EXISTS categories (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL UNIQUE,
@@ -30,19 +310,17 @@ def init_database():
                 type TEXT NOT NULL CHECK(type IN ('class', 'lesson', 'topic')),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
-
+        '''),
         # Таблица букв (для словарных слов)
-        cursor.execute('''
+        Sql('''
             CREATE TABLE IF NOT EXISTS letters (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 letter TEXT NOT NULL UNIQUE,
                 sort_order INTEGER
             )
-        ''')
-
+        '''),
         # Таблица слов
-        cursor.execute('''
+        Sql('''
             CREATE TABLE IF NOT EXISTS words (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 russian_word TEXT NOT NULL,
@@ -54,15 +332,215 @@ def init_database():
                 FOREIGN KEY (category_id) REFERENCES categories(id),
                 FOREIGN KEY (letter_id) REFERENCES letters(id)
             )
+        '''),
+        # Индексы для быстрого поиска
+        Sql('CREATE INDEX IF NOT EXISTS idx_words_category ON words(category_id)'),
+        Sql('CREATE INDEX IF NOT EXISTS idx_words_letter ON words(letter_id)'),
+        Sql('CREATE INDEX IF NOT EXISTS idx_words_russian ON words(russian_word)'),
+    ]),
+    (2, DICTIONARY, 'Режим WAL и составной индекс по категории и букве', [
+        Sql('PRAGMA journal_mode = WAL', transactional=False),
+        Sql('CREATE INDEX IF NOT EXISTS idx_words_category_letter ON words(category_id, letter_id)'),
+    ]),
+    (3, DICTIONARY, 'Каноническая форма русского слова', [
+        AddColumn('words', 'russian_canonical', 'TEXT'),
+        Backfill('words', 'russian_canonical', 'russian_word', canonical_word),
+        Sql('CREATE INDEX IF NOT EXISTS idx_words_canonical ON words(russian_canonical)'),
+    ]),
+    (4, DICTIONARY, 'Случайный ключ для выборки слов', [
+        AddColumn('words', 'random_key', 'INTEGER'),
+        Backfill('words', 'random_key', 'id', lambda _: random_key()),
+        Sql('CREATE INDEX IF NOT EXISTS idx_words_random_key ON words(random_key)'),
+    ]),
+    (5, LEARNERS, 'Списки слов сессий на сервере', [
+        Sql('''
+            CREATE TABLE IF NOT EXISTS word_lists (
+                id TEXT PRIMARY KEY,
+                pairs TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''),
+        Sql('CREATE INDEX IF NOT EXISTS idx_word_lists_created ON word_lists(created_at)'),
+    ]),
+    (6, LEARNERS, 'Попытки учеников и сводные таблицы ошибок', [
+        # Сырые попытки (для выгрузки); отчёты строятся только по сводным таблицам
+        Sql('''
+            CREATE TABLE IF NOT EXISTS attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                learner_id TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                heard_word TEXT,
+                correct_word TEXT NOT NULL,
+                user_answer TEXT NOT NULL,
+                is_correct INTEGER NOT NULL,
+                category_id INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        '''),
+        Sql('CREATE INDEX IF NOT EXISTS idx_attempts_learner ON attempts(learner_id, created_at)'),
+        Sql('CREATE INDEX IF NOT EXISTS idx_attempts_created ON attempts(created_at)'),
+        # Ошибки по словам
+        Sql('''
+            CREATE TABLE IF NOT EXISTS stats_words (
+                learner_id TEXT NOT NULL,
+                word TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                errors INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (learner_id, word)
+            ) WITHOUT ROWID
+        '''),
+        Sql('CREATE INDEX IF NOT EXISTS idx_stats_words_errors ON stats_words(learner_id, errors, word)'),
+        # Ошибки по позициям букв в словах
+        Sql('''
+            CREATE TABLE IF NOT EXISTS stats_positions (
+                learner_id TEXT NOT NULL,
+                word TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                letter TEXT NOT NULL,
+                errors INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (learner_id, word, position)
+            ) WITHOUT ROWID
+        '''),
+        Sql('''
+            CREATE INDEX IF NOT EXISTS idx_stats_positions_errors
+            ON stats_positions(learner_id, errors, word, position)
+        '''),
+        Sql('CREATE INDEX IF NOT EXISTS idx_stats_positions_letter ON stats_positions(learner_id, letter)'),
+        # Ошибки по категориям
+        Sql('''
+            CREATE TABLE IF NOT EXISTS stats_categories (
+                learner_id TEXT NOT NULL,
+                category_id INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                errors INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (learner_id, category_id)
+            ) WITHOUT ROWID
+        '''),
+    ]),
+    (7, LEARNERS, 'Режим WAL для баз школ', [
+        # Миграция 2 в базах школ не выполняется
+        Sql('PRAGMA journal_mode = WAL', transactional=False),
+    ]),
+    (8, DICTIONARY, 'Счётчик изменений словаря', [
+        # Версия только словаря: записи попыток и списков слов её не меняют
+        Sql('''
+            CREATE TABLE IF NOT EXISTS dictionary_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        '''),
+        Sql('INSERT OR IGNORE INTO dictionary_version (id, version) VALUES (1, 0)'),
+    ] + [
+        Sql(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_version
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE dictionary_version SET version = version + 1 WHERE id = 1;
+            END
         ''')
+        for table in ('words', 'categories', 'letters')
+        for event in ('INSERT', 'UPDATE', 'DELETE')
+    ]),
+    (9, DICTIONARY, 'Случайный ключ для слов, добавленных в обход add_word', [
+        # Строки без ключа не попадают в выборку sample_words
+        Sql('''
+            CREATE TRIGGER IF NOT EXISTS trg_words_random_key
+            AFTER INSERT ON words
+            WHEN NEW.random_key IS NULL
+            BEGIN
+                UPDATE words SET random_key = (random() & 4611686018427387903) WHERE id = NEW.id;
+            END
+        '''),
+        Backfill('words', 'random_key', 'id', lambda _: random_key()),
+        Backfill('words', 'russian_canonical', 'russian_word', canonical_word),
+    ]),
+    (10, LEARNERS, 'Результаты сессии в попытках, а не в cookie', [
+        AddColumn('attempts', 'session_id', 'TEXT'),
+        Sql('CREATE INDEX IF NOT EXISTS idx_attempts_session ON attempts(session_id)'),
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version():
+    """Текущая версия схемы базы данных"""
+    with get_db() as conn:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
 
-        # Индексы для быстрого поиска
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_words_category ON words(category_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_words_letter ON words(letter_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_words_russian ON words(russian_word)')
 
-        conn.commit()
-        print("✅ База данных успешно инициализирована!")
+def migrate(target=None, dry_run=False, batch_size=MIGRATION_BATCH_SIZE, tenant=None):
+    """Применение недостающих миграций; возвращает отчёт по шагам"""
+    if target is None:
+        target = SCHEMA_VERSION
+
+    path = tenant_database_path(tenant) if tenant else DATABASE_PATH
+
+    # Автокоммит: транзакциями шагов управляем сами
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        current = conn.execute('PRAGMA user_version').fetchone()[0]
+        report = []
+
+        for version, scope, description, steps in MIGRATIONS:
+            if version <= current or version > target:
+                continue
+
+            # Миграции словаря в базе школы пропускаем, но версию всё равно поднимаем
+            if tenant and scope != LEARNERS:
+                steps = []
+
+            for step in steps:
+                entry = {
+                    'version': version,
+                    'migration': description,
+                    'step': step.describe(),
+                    'rows': step.estimate(conn) if dry_run else 0,
+                    'batches': 0,
+                    'seconds': 0.0,
+                }
+                if not dry_run:
+                    started = time.perf_counter()
+                    try:
+                        entry['rows'], entry['batches'] = step.apply(conn, batch_size)
+                    except Exception:
+                        if conn.in_transaction:
+                            conn.execute('ROLLBACK')
+                        raise
+                    entry['seconds'] = time.perf_counter() - started
+                report.append(entry)
+
+            # Версия фиксируется только после всех шагов; шаги идемпотентны
+            if not dry_run:
+                conn.execute(f'PRAGMA user_version = {version}')
+
+        return report
+    finally:
+        conn.close()
+
+
+def init_database():
+    """Инициализация базы данных"""
+    # Схема уже актуальна — ничего не создаём и не коммитим
+    if get_schema_version() >= SCHEMA_VERSION:
+        return False
+
+    migrate()
+    print("✅ База данных успешно инициализирована!")
+    return True
+
+
+def create_tenant(tenant):
+    """Создание базы школы; возвращает False, если она уже есть"""
+    path = tenant_database_path(tenant)
+    if os.path.exists(path):
+        return False
+
+    os.makedirs(TENANT_DATABASES_DIR, exist_ok=True)
+    migrate(tenant=tenant)
+    print(f"✅ База школы '{tenant}' создана: {path}")
+    return True
 
 
 def add_category(name, description='', category_type='class'):
@@ -118,9 +596,13 @@ def add_word(russian_word, english_word=None, category_name=None, difficulty=1):
                 category_id = result[0]
 
         cursor.execute('''
-            INSERT INTO words (russian_word, english_word, category_id, letter_id, difficulty)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (russian_word, english_word, category_id, letter_id, difficulty))
+            INSERT INTO words (
+                russian_word, english_word, category_id, letter_id, difficulty,
+                russian_canonical, random_key
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (russian_word, english_word, category_id, letter_id, difficulty,
+              canonical_word(russian_word), random_key()))
 
         conn.commit()
         return cursor.lastrowid
@@ -181,6 +663,76 @@ def get_words_by_filters(category_ids=None, letter_ids=None, limit=None):
         return [dict(row) for row in cursor.fetchall()]
 
 
+def count_words_by_filters(category_ids=None, letter_ids=None, with_translation=False):
+    """Подсчет количества слов по фильтрам"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+
+        query = 'SELECT COUNT(*) FROM words w WHERE 1=1'
+        params = []
+
+        if category_ids:
+            placeholders = ','.join('?' * len(category_ids))
+            query += f' AND w.category_id IN ({placeholders})'
+            params.extend(category_ids)
+
+        if letter_ids:
+            placeholders = ','.join('?' * len(letter_ids))
+            query += f' AND w.letter_id IN ({placeholders})'
+            params.extend(letter_ids)
+
+        if with_translation:
+            query += " AND w.english_word IS NOT NULL AND w.english_word != ''"
+
+        cursor.execute(query, params)
+        return cursor.fetchone()[0]
+
+
+def sample_words(count, category_ids=None, letter_ids=None, with_translation=False):
+    """Случайная выборка слов по фильтрам.
+    Ключи random_key постоянны, поэтому выборка — участок одной фиксированной перестановки
+    от случайной точки: при count, сравнимом с числом подходящих слов, сессии сильно пересекаются"""
+    with get_db() as conn:
+        query = '''
+            SELECT w.*, c.name as category_name, l.letter
+            FROM words w
+            LEFT JOIN categories c ON w.category_id = c.id
+            LEFT JOIN letters l ON w.letter_id = l.id
+            WHERE 1=1
+        '''
+        params = []
+
+        if category_ids:
+            placeholders = ','.join('?' * len(category_ids))
+            query += f' AND w.category_id IN ({placeholders})'
+            params.extend(category_ids)
+
+        if letter_ids:
+            placeholders = ','.join('?' * len(letter_ids))
+            query += f' AND w.letter_id IN ({placeholders})'
+            params.extend(letter_ids)
+
+        if with_translation:
+            query += " AND w.english_word IS NOT NULL AND w.english_word != ''"
+
+        # Окно по случайному ключу от случайной точки (с переходом через начало)
+        # вместо ORDER BY RANDOM(), которому нужно прочитать и отсортировать все строки
+        pivot = random_key()
+        rows = conn.execute(
+            query + ' AND w.random_key >= ? ORDER BY w.random_key LIMIT ?',
+            params + [pivot, count]
+        ).fetchall()
+        if len(rows) < count:
+            rows += conn.execute(
+                query + ' AND w.random_key < ? ORDER BY w.random_key LIMIT ?',
+                params + [pivot, count - len(rows)]
+            ).fetchall()
+
+    words = [dict(row) for row in rows]
+    random.shuffle(words)
+    return words
+
+
 def get_words_count_by_letter(category_id=None):
     """Получение количества слов по буквам"""
     with get_db() as conn:
@@ -202,6 +754,45 @@ def get_words_count_by_letter(category_id=None):
         return [dict(row) for row in cursor.fetchall()]
 
 
+def save_word_list(pairs, ttl_days=7):
+    """Сохранение списка слов сессии; возвращает его идентификатор"""
+    list_id = secrets.token_urlsafe(16)
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'INSERT INTO word_lists (id, pairs, size) VALUES (?, ?, ?)',
+            (list_id, json.dumps(pairs, ensure_ascii=False), len(pairs))
+        )
+        # Попутно удаляем списки заброшенных сессий
+        cursor.execute(
+            "DELETE FROM word_lists WHERE created_at < datetime('now', ?)",
+            (f'-{ttl_days} days',)
+        )
+        conn.commit()
+    return list_id
+
+
+def load_word_list(list_id):
+    """Загрузка списка слов сессии (списки неизменяемы, поэтому кэшируются)"""
+    # Кэш общий для всех школ, поэтому школа входит в ключ
+    try:
+        return _load_word_list(_current_tenant.get(), list_id)
+    except KeyError:
+        # Промахи не кэшируются: исключение lru_cache не запоминает
+        return ()
+
+
+@lru_cache(maxsize=1024)
+def _load_word_list(tenant, list_id):
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT pairs FROM word_lists WHERE id = ?', (list_id,))
+        row = cursor.fetchone()
+        if row is None:
+            raise KeyError(list_id)
+        return tuple(tuple(pair) for pair in json.loads(row[0]))
+
+
 def delete_all_words():
     """Удаление всех слов (для переинициализации)"""
     with get_db() as conn:
@@ -0,0 +1,122 @@
+"""
+Потоковая выгрузка попыток учеников в CSV или JSONL (опционально в gzip).
+Строки читаются из курсора порциями, поэтому память не зависит от объёма выгрузки
+"""
+
+import csv
+import io
+import itertools
+import json
+import zlib
+from datetime import datetime
+
+from database import get_db
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+EXPORT_COLUMNS = (
+    'id', 'learner_id', 'mode', 'heard_word', 'correct_word', 'user_answer',
+    'is_correct', 'category_id', 'category_name', 'created_at'
+)
+
+
+def build_attempts_query(learner_id=None, category_id=None, date_from=None, date_to=None):
+    """SQL-запрос выгрузки с фильтрами; даты — в формате ГГГГ-ММ-ДД, включительно"""
+    query = '''
+        SELECT a.id, a.learner_id, a.mode, a.heard_word, a.correct_word, a.user_answer,
+               a.is_correct, a.category_id, c.name AS category_name, a.created_at
+        FROM attempts a
+        LEFT JOIN categories c ON a.category_id = c.id
+        WHERE 1=1
+    '''
+    params = []
+
+    if learner_id:
+        query += ' AND a.learner_id = ?'
+        params.append(learner_id)
+
+    if category_id:
+        query += ' AND a.category_id = ?'
+        params.append(category_id)
+
+    for value in (date_from, date_to):
+        if value:
+            # Проверяем формат заранее: после начала потоковой отдачи ошибку уже не вернуть
+            try:
+                datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(f"Некорректная дата: '{value}' (нужно ГГГГ-ММ-ДД)")
+
+    if date_from:
+        query += ' AND a.created_at >= ?'
+        params.append(date_from)
+
+    if date_to:
+        query += " AND a.created_at < date(?, '+1 day')"
+        params.append(date_to)
+
+    query += ' ORDER BY a.id'
+    return query, params
+
+
+def iter_attempt_rows(query, params, chunk_size=EXPORT_CHUNK_SIZE):
+    """Порции строк из курсора SQLite"""
+    with get_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def iter_csv(chunks):
+    """CSV по порциям строк; BOM нужен, чтобы Excel распознал UTF-8"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(tuple(row) for row in rows)
+        yield buffer.getvalue()
+
+
+def iter_jsonl(chunks):
+    """JSON Lines по порциям строк"""
+    for rows in chunks:
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+
+def iter_gzip(parts):
+    """Потоковое сжатие в формат gzip"""
+    compressor = zlib.compressobj(wbits=31)
+    for part in parts:
+        data = compressor.compress(part)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_attempts(fmt='csv', compress=False, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """Генератор байтов выгрузки; ошибки фильтров возникают сразу, до первой порции"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: '{fmt}'")
+
+    query, params = build_attempts_query(**filters)
+    chunks = iter_attempt_rows(query, params, chunk_size)
+
+    # Первая порция читается сразу, чтобы ошибки SQL всплыли до начала отдачи
+    first = next(chunks, None)
+    chunks = itertools.chain([first] if first else [], chunks)
+    text = iter_csv(chunks) if fmt == 'csv' else iter_jsonl(chunks)
+    parts = (part.encode('utf-8') for part in text)
+    return iter_gzip(parts) if compress else parts
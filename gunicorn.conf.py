@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+Конфигурация gunicorn: gunicorn -c gunicorn.conf.py app:app
+
+Перед запуском выполните `python manage.py migrate`. Приложение загружается
+один раз в мастере (preload) в ленивом режиме, воркеры наследуют уже
+импортированные модули, а соединения с БД и пулы TTS открывают сами после fork.
+"""
+
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+# Ленивый старт, если не задано явно
+os.environ.setdefault('LAZY_STARTUP', '1')
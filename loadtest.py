@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нагрузочное тестирование: «классы» виртуальных учеников проходят тренировку
+как training.js против локально запущенного gunicorn с фейковым TTS.
+Перебирает число воркеров и потоков и показывает пропускную способность
+до насыщения и хвостовые задержки.
+
+Пример: python loadtest.py --workers 1,2,4 --threads 1,4 --learners 10,30,60 --duration 30
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import database
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Recorder:
+    """Сбор задержек запросов по эндпоинтам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.sessions = 0
+
+    def add(self, name, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def session_finished(self):
+        with self._lock:
+            self.sessions += 1
+
+    def all_latencies(self):
+        return [value for values in self.latencies.values() for value in values]
+
+
+def percentile(values, percent):
+    """Перцентиль по отсортированной выборке (в миллисекундах)"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index] * 1000
+
+
+class VirtualLearner(threading.Thread):
+    """Ученик: набор слов, затем цикл «слово → озвучка → ответ», затем результаты"""
+
+    def __init__(self, base_url, recorder, stop_at, args, letter_ids):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self.recorder = recorder
+        self.stop_at = stop_at
+        self.args = args
+        self.letter_ids = letter_ids
+        # У каждого ученика своя cookie-сессия
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, name, path, payload=None, raw=False):
+        data = None
+        headers = {}
+        if payload is not None:
+            data = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+
+        started = time.perf_counter()
+        ok = True
+        body = None
+        try:
+            req = urllib.request.Request(self.base_url + path, data=data, headers=headers)
+            with self.opener.open(req, timeout=self.args.timeout) as response:
+                content = response.read()
+            if not raw:
+                body = json.loads(content)
+                ok = body.get('success', True) is not False
+        except (urllib.error.URLError, OSError, ValueError):
+            ok = False
+        self.recorder.add(name, time.perf_counter() - started, ok)
+        return body
+
+    def think(self, seconds):
+        # Экспоненциальное время раздумий вокруг среднего, не дольше конца прогона
+        delay = random.expovariate(1 / seconds) if seconds > 0 else 0
+        time.sleep(max(0.0, min(delay, self.stop_at - time.monotonic())))
+
+    def run(self):
+        # Ученики приходят не одновременно
+        time.sleep(random.uniform(0, self.args.think_time))
+        while time.monotonic() < self.stop_at:
+            self.run_session()
+
+    def run_session(self):
+        started = self.request('get_words_from_db', '/api/get_words_from_db', {
+            'category_ids': [self.args.category_id],
+            'letter_ids': self.letter_ids,
+            'mode': 'ru_only'
+        })
+        if not started:
+            self.think(self.args.think_time)
+            return
+
+        for _ in range(self.args.session_words):
+            if time.monotonic() >= self.stop_at:
+                return
+
+            # training.js запрашивает текущее слово дважды: для экрана и для озвучки
+            word = self.request('get_current_word', '/api/get_current_word')
+            if not word or word.get('finished'):
+                break
+            word = self.request('get_current_word', '/api/get_current_word')
+            if not word or word.get('finished'):
+                break
+
+            audio = self.request('generate_audio', '/api/generate_audio', {
+                'word': word['speak_word'],
+                'lang': word['speak_lang']
+            })
+            if audio and audio.get('audio_url'):
+                self.request('audio', urllib.parse.quote(audio['audio_url']), raw=True)
+
+            self.think(self.args.think_time)
+
+            answer = word['speak_word']
+            if random.random() > self.args.accuracy:
+                answer = answer[:-1] or 'а'
+            self.request('check_answer', '/api/check_answer', {'answer': answer})
+
+            # Пауза перед следующим словом, как setTimeout в training.js
+            time.sleep(1.5)
+
+        self.request('get_results', '/api/get_results')
+        self.recorder.session_finished()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def prepare_workdir(source_db):
+    """Рабочая папка с копией БД, чтобы попытки учеников не попали в настоящую базу"""
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    db_path = os.path.join(workdir, 'words_database.db')
+    shutil.copy(source_db, db_path)
+    database.DATABASE_PATH = db_path
+    database.migrate()
+    os.makedirs(os.path.join(workdir, 'audio_cache'))
+    return workdir
+
+
+def start_server(workdir, workers, threads, port, args):
+    env = dict(
+        os.environ,
+        PYTHONPATH=REPO_DIR,
+        SECRET_KEY='loadtest',
+        TTS_BACKEND='fake',
+        TTS_FAKE_DELAY=str(args.tts_delay),
+        # Лимиты допуска не должны искажать замер пропускной способности
+        TTS_SESSION_RATE='1000',
+        TTS_GLOBAL_RATE='100000',
+        TTS_MAX_QUEUE='10000',
+        GUNICORN_BIND=f'127.0.0.1:{port}',
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_THREADS=str(threads),
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_DIR, 'gunicorn.conf.py'), 'app:app'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn завершился при старте')
+        try:
+            urllib.request.urlopen(base_url + '/api/get_categories', timeout=1).read()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn не ответил за 30 секунд')
+
+
+def run_level(base_url, learners, args):
+    """Один прогон с заданным числом учеников"""
+    with urllib.request.urlopen(f'{base_url}/api/get_letters?category_id={args.category_id}') as response:
+        letters = json.loads(response.read())['letters']
+    letter_ids = [l['id'] for l in letters if l['count']]
+
+    recorder = Recorder()
+    stop_at = time.monotonic() + args.duration
+    threads = [VirtualLearner(base_url, recorder, stop_at, args, letter_ids) for _ in range(learners)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=args.duration + args.timeout + 5)
+    elapsed = time.monotonic() - started
+
+    latencies = recorder.all_latencies()
+    return {
+        'learners': learners,
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed if elapsed else 0,
+        'error_rate': sum(recorder.errors.values()) / len(latencies) if latencies else 0,
+        'errors': dict(recorder.errors),
+        'sessions': recorder.sessions,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'by_endpoint': {
+            name: (percentile(values, 50), percentile(values, 95), percentile(values, 99))
+            for name, values in sorted(recorder.latencies.items())
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест тренажёра против gunicorn')
+    parser.add_argument('--workers', default='1,2,4', help='число воркеров через запятую')
+    parser.add_argument('--threads', default='1,4', help='число потоков через запятую')
+    parser.add_argument('--learners', default='10,30,60', help='число учеников через запятую (по возрастанию)')
+    parser.add_argument('--duration', type=float, default=30, help='длительность прогона, с')
+    parser.add_argument('--think-time', type=float, default=3.0, help='среднее время ответа ученика, с')
+    parser.add_argument('--session-words', type=int, default=20, help='слов в одном уроке')
+    parser.add_argument('--accuracy', type=float, default=0.8, help='доля правильных ответов')
+    parser.add_argument('--category-id', type=int, default=1, help='категория слов')
+    parser.add_argument('--tts-delay', type=float, default=0.05, help='задержка фейкового TTS, с')
+    parser.add_argument('--slo-ms', type=float, default=500, help='порог p95 для насыщения, мс')
+    parser.add_argument('--timeout', type=float, default=10, help='таймаут запроса, с')
+    parser.add_argument('--db', default=os.path.join(REPO_DIR, database.DATABASE_PATH), help='исходная БД')
+    parser.add_argument('--json', help='сохранить сырые результаты в файл')
+    args = parser.parse_args()
+
+    workers_list = [int(v) for v in args.workers.split(',')]
+    threads_list = [int(v) for v in args.threads.split(',')]
+    learners_list = sorted(int(v) for v in args.learners.split(','))
+
+    results = []
+    for workers in workers_list:
+        for threads in threads_list:
+            workdir = prepare_workdir(args.db)
+            process, base_url = start_server(workdir, workers, threads, free_port(), args)
+            try:
+                print(f"\n🚀 workers={workers} threads={threads}")
+                for learners in learners_list:
+                    level = run_level(base_url, learners, args)
+                    level.update(workers=workers, threads=threads)
+                    results.append(level)
+                    print(f"  {learners:>5} учеников: {level['rps']:>8.1f} req/s, "
+                          f"p50 {level['p50']:>7.1f} мс, p95 {level['p95']:>7.1f} мс, "
+                          f"p99 {level['p99']:>7.1f} мс, ошибок {level['error_rate']:.1%}")
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    print("\n" + "=" * 78)
+    print(f"📊 НАСЫЩЕНИЕ (p95 ≤ {args.slo_ms:.0f} мс и ошибок < 1%)")
+    print("=" * 78)
+    print(f"{'workers':>8}{'threads':>8}{'учеников':>10}{'req/s':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for workers in workers_list:
+        for threads in threads_list:
+            levels = [r for r in results if r['workers'] == workers and r['threads'] == threads]
+            healthy = [r for r in levels if r['p95'] <= args.slo_ms and r['error_rate'] < 0.01]
+            if healthy:
+                best = max(healthy, key=lambda r: r['rps'])
+                print(f"{workers:>8}{threads:>8}{best['learners']:>10}{best['rps']:>10.1f}"
+                      f"{best['p95']:>10.1f}{best['p99']:>10.1f}")
+            else:
+                print(f"{workers:>8}{threads:>8}{'—':>10}  (SLO не выдержан уже на {levels[0]['learners']} учениках)")
+    print("=" * 78)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ Результаты сохранены в {args.json}")
+
+
+if __name__ == '__main__':
+    main()
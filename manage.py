@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Команды обслуживания приложения: миграция схемы, базы школ, выгрузка и отчёт о времени старта
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from database import (
+    MIGRATION_BATCH_SIZE, SCHEMA_VERSION, UnknownTenantError, configure_tenants, create_tenant,
+    get_schema_version, list_tenants, migrate, reset_current_tenant, set_current_tenant
+)
+from export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_attempts
+
+# Замер в отдельном интерпретаторе: импорт приложения и первый запрос к нему
+STARTUP_PROBE = '''
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.app.test_client().get('/api/get_categories')
+first_request = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (first_request - imported) * 1000,
+}))
+'''
+
+
+def tenant_schema_version(tenant):
+    """Версия схемы общей базы (tenant=None) или базы школы"""
+    token = set_current_tenant(tenant)
+    try:
+        return get_schema_version()
+    finally:
+        reset_current_tenant(token)
+
+
+def cmd_migrate(args):
+    """Миграция схемы базы данных до актуальной версии"""
+    if args.all_tenants:
+        tenants = [None] + list_tenants()
+    else:
+        tenants = [args.tenant]
+
+    for tenant in tenants:
+        migrate_database(args, tenant)
+
+
+def migrate_database(args, tenant=None):
+    """Миграция одной базы: общей или базы школы"""
+    name = f"школы '{tenant}'" if tenant else 'общей базы'
+    version = tenant_schema_version(tenant)
+    target = args.target if args.target is not None else SCHEMA_VERSION
+    report = migrate(target=target, dry_run=args.dry_run, batch_size=args.batch_size, tenant=tenant)
+
+    if not report:
+        print(f"✅ Схема {name} актуальна (версия {version})")
+        return
+
+    print("=" * 60)
+    title = 'ПЛАН МИГРАЦИИ (dry run)' if args.dry_run else 'ОТЧЁТ О МИГРАЦИИ'
+    print(f"📊 {title} {name}: версия {version} → {target}")
+    print("=" * 60)
+
+    current_version = None
+    for entry in report:
+        if entry['version'] != current_version:
+            current_version = entry['version']
+            print(f"\n[{entry['version']}] {entry['migration']}")
+        step = entry['step'] if len(entry['step']) <= 70 else entry['step'][:67] + '...'
+        if args.dry_run:
+            rows = f" (строк: {entry['rows']})" if entry['rows'] else ''
+            print(f"  • {step}{rows}")
+        else:
+            print(f"  • {step}")
+            print(f"    {entry['seconds'] * 1000:.1f} мс, строк: {entry['rows']}, пакетов: {entry['batches']}")
+
+    total = sum(entry['seconds'] for entry in report)
+    print("=" * 60)
+    if args.dry_run:
+        print("Изменения не применялись")
+    else:
+        print(f"✅ Схема обновлена до версии {target} за {total * 1000:.1f} мс")
+
+
+def cmd_tenant_create(args):
+    """Создание базы новой школы"""
+    if not create_tenant(args.name):
+        print(f"⚠️ База школы '{args.name}' уже существует")
+
+
+def cmd_tenant_list(args):
+    """Список школ и версий схемы их баз"""
+    tenants = list_tenants()
+    if not tenants:
+        print("Баз школ нет")
+    for tenant in tenants:
+        version = tenant_schema_version(tenant)
+        mark = '✅' if version >= SCHEMA_VERSION else '⚠️'
+        print(f"{mark} {tenant} (версия {version})")
+
+
+def cmd_export(args):
+    """Выгрузка попыток учеников в файл или stdout"""
+    if args.tenant:
+        set_current_tenant(args.tenant)
+
+    parts = export_attempts(
+        args.format,
+        compress=args.gzip,
+        chunk_size=args.chunk_size,
+        learner_id=args.learner_id,
+        category_id=args.category_id,
+        date_from=args.date_from,
+        date_to=args.date_to
+    )
+
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        written = 0
+        for part in parts:
+            output.write(part)
+            written += len(part)
+    finally:
+        if args.output:
+            output.close()
+
+    if args.output:
+        print(f"✅ Выгружено {written} байт в {args.output}")
+
+
+def run_probe(lazy):
+    """Один замер старта приложения в новом процессе"""
+    env = dict(os.environ, LAZY_STARTUP='1' if lazy else '0', TTS_BACKEND='fake')
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_PROBE],
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(lazy, limit, depth=2):
+    """Самые долгие импорты внутри app по данным python -X importtime"""
+    env = dict(os.environ, LAZY_STARTUP='1' if lazy else '0', TTS_BACKEND='fake')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        env=env, capture_output=True, text=True, check=True
+    )
+
+    # Формат строки: "import time: self [us] | cumulative | imported package",
+    # вложенность — по два пробела; вложенные модули печатаются раньше родителя
+    pending = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        pending.append((level, int(cumulative) / 1000, name.strip()))
+        if level == 0:
+            if name.strip() == 'app':
+                break
+            pending = []
+
+    imports = [
+        (cumulative_ms, '  ' * (level - 1) + name)
+        for level, cumulative_ms, name in pending
+        if 1 <= level <= depth
+    ]
+    return sorted(imports, key=lambda item: item[0], reverse=True)[:limit]
+
+
+def cmd_startup_report(args):
+    """Отчёт о времени импорта и холодного старта в обычном и ленивом режимах"""
+    if get_schema_version() < SCHEMA_VERSION:
+        print("⚠️ Схема не мигрирована — ленивый режим ответит 503. Выполните: python manage.py migrate")
+
+    print("=" * 60)
+    print(f"📊 ВРЕМЯ СТАРТА (медиана из {args.runs} запусков, мс)")
+    print("=" * 60)
+    print(f"{'Режим':<10}{'Импорт app':>15}{'Первый запрос':>17}{'Итого':>13}")
+
+    for lazy in (False, True):
+        probes = [run_probe(lazy) for _ in range(args.runs)]
+        import_ms = statistics.median(p['import_ms'] for p in probes)
+        request_ms = statistics.median(p['first_request_ms'] for p in probes)
+        mode = 'lazy' if lazy else 'eager'
+        print(f"{mode:<10}{import_ms:>15.1f}{request_ms:>17.1f}{import_ms + request_ms:>13.1f}")
+
+    for lazy in (False, True):
+        print(f"\nСамые долгие импорты ({'lazy' if lazy else 'eager'}):")
+        for cumulative_ms, name in slowest_imports(lazy, args.top, args.depth):
+            print(f"  {cumulative_ms:>9.1f} мс  {name}")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Обслуживание тренажёра правописания')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help='миграция схемы БД')
+    migrate_parser.add_argument('--dry-run', action='store_true', help='показать план без изменений')
+    migrate_parser.add_argument('--target', type=int, help='целевая версия схемы')
+    migrate_parser.add_argument('--batch-size', type=int, default=MIGRATION_BATCH_SIZE,
+                                help='строк в одной транзакции при заполнении колонок')
+    migrate_parser.add_argument('--tenant', help='мигрировать базу этой школы')
+    migrate_parser.add_argument('--all-tenants', action='store_true',
+                                help='мигрировать общую базу и базы всех школ')
+    migrate_parser.set_defaults(func=cmd_migrate)
+
+    tenant_create = subparsers.add_parser('tenant-create', help='создать базу школы')
+    tenant_create.add_argument('name', help='имя школы: латиница, цифры, - и _')
+    tenant_create.set_defaults(func=cmd_tenant_create)
+
+    tenant_list = subparsers.add_parser('tenant-list', help='список баз школ')
+    tenant_list.set_defaults(func=cmd_tenant_list)
+
+    export_parser = subparsers.add_parser('export', help='выгрузка попыток учеников')
+    export_parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    export_parser.add_argument('--gzip', action='store_true', help='сжать в gzip')
+    export_parser.add_argument('--output', '-o', help='файл (по умолчанию stdout)')
+    export_parser.add_argument('--learner-id', help='только этот ученик')
+    export_parser.add_argument('--category-id', type=int, help='только эта категория')
+    export_parser.add_argument('--date-from', help='с даты ГГГГ-ММ-ДД включительно')
+    export_parser.add_argument('--date-to', help='по дату ГГГГ-ММ-ДД включительно')
+    export_parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                               help='строк в одной порции чтения')
+    export_parser.add_argument('--tenant', help='выгрузить попытки этой школы')
+    export_parser.set_defaults(func=cmd_export)
+
+    report = subparsers.add_parser('startup-report', help='отчёт о времени старта')
+    report.add_argument('--runs', type=int, default=5, help='число замеров на режим')
+    report.add_argument('--top', type=int, default=10, help='сколько импортов показать')
+    report.add_argument('--depth', type=int, default=2, help='глубина вложенных импортов под app')
+    report.set_defaults(func=cmd_startup_report)
+
+    args = parser.parse_args()
+
+    # Папка баз школ — та же переменная окружения, что и у приложения
+    if os.environ.get('TENANT_DATABASES_DIR'):
+        configure_tenants(os.environ['TENANT_DATABASES_DIR'])
+
+    try:
+        args.func(args)
+    except (UnknownTenantError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Ограничение частоты и допуск запросов на синтез речи
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class RateLimited(Exception):
+    """Запрос отклонён; retry_after — через сколько секунд стоит повторить"""
+
+    def __init__(self, retry_after, reason=''):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucket:
+    """Корзина токенов: rate токенов в секунду, не больше capacity"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, tokens=1):
+        """Взять токены; возвращает 0 или время ожидания до их появления"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            if tokens > self.capacity:
+                return math.inf
+            return (tokens - self._tokens) / self.rate
+
+    def refund(self, tokens=1):
+        """Вернуть токены, если запрос всё равно не был выполнен"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+
+class AdmissionController:
+    """Допуск синтеза: лимиты на сессию и на весь процесс, число одновременных синтезов и очередь"""
+
+    def __init__(self, session_rate, session_burst, global_rate, global_burst,
+                 max_concurrent, max_queue, queue_timeout, max_sessions=10000):
+        self.session_rate = session_rate
+        self.session_burst = session_burst
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_sessions = max_sessions
+
+        self._global = TokenBucket(global_rate, global_burst)
+        self._sessions = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _session_bucket(self, key):
+        with self._sessions_lock:
+            bucket = self._sessions.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.session_rate, self.session_burst)
+                self._sessions[key] = bucket
+                # Забываем самые давние сессии, чтобы память не росла
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(key)
+            return bucket
+
+    def _take_tokens(self, key, tokens):
+        session_bucket = self._session_bucket(key)
+        wait = session_bucket.take(tokens)
+        if wait:
+            raise RateLimited(wait, 'Слишком много запросов на озвучивание')
+
+        wait = self._global.take(tokens)
+        if wait:
+            session_bucket.refund(tokens)
+            raise RateLimited(wait, 'Сервис озвучивания перегружен')
+
+    def _refund(self, key, tokens):
+        self._session_bucket(key).refund(tokens)
+        self._global.refund(tokens)
+
+    def _acquire_slot(self):
+        with self._waiting_lock:
+            if self._waiting >= self.max_queue:
+                raise RateLimited(self.queue_timeout, 'Очередь на озвучивание заполнена')
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+        if not acquired:
+            raise RateLimited(self.queue_timeout, 'Сервис озвучивания перегружен')
+
+    def reserve(self, key, tokens=1):
+        """Списание токенов на tokens синтезов; слоты берутся отдельно через slot()"""
+        self._take_tokens(key, tokens)
+
+    @contextmanager
+    def slot(self, key, tokens=1):
+        """Слот одного синтеза; если слот не получен, tokens возвращаются сессии"""
+        try:
+            self._acquire_slot()
+        except RateLimited:
+            self._refund(key, tokens)
+            raise
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def batch(self, key, tokens):
+        """Допуск пакета из tokens синтезов: очередь проверяется и токены списываются сразу,
+        а слот каждый синтез берёт через BatchSlots.slot()"""
+        with self._waiting_lock:
+            if self._waiting >= self.max_queue:
+                raise RateLimited(self.queue_timeout, 'Очередь на озвучивание заполнена')
+        self.reserve(key, tokens)
+        return BatchSlots(self, key)
+
+    @contextmanager
+    def admit(self, key, tokens=1):
+        """Допуск одного синтеза для ключа сессии; при отказе — RateLimited"""
+        self.reserve(key, tokens)
+        with self.slot(key, tokens):
+            yield
+
+
+class BatchSlots:
+    """Слоты синтезов одного пакета: после первого отказа остальные синтезы отклоняются сразу"""
+
+    def __init__(self, controller, key):
+        self.controller = controller
+        self.key = key
+        # Первый отказ; пакет целиком отвечает на него 429
+        self.refused = None
+
+    @contextmanager
+    def slot(self):
+        if self.refused is not None:
+            self.controller._refund(self.key, 1)
+            raise self.refused
+        try:
+            self.controller._acquire_slot()
+        except RateLimited as e:
+            self.controller._refund(self.key, 1)
+            self.refused = e
+            raise
+        try:
+            yield
+        finally:
+            self.controller._slots.release()
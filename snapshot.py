@@ -0,0 +1,260 @@
+"""
+Снимок словаря в памяти: слова, категории и буквы читаются из SQLite один раз
+(и заново при изменении словаря), а фильтры и подсчёты считаются без запросов к БД
+"""
+
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from array import array
+
+import database
+
+
+class WordSnapshot:
+    """Неизменяемый снимок таблиц words, categories и letters"""
+
+    def __init__(self, word_rows, word_columns, categories, letters, dictionary_version=None):
+        self.dictionary_version = dictionary_version
+        self.loaded_at = time.time()
+        self.categories = tuple(categories)
+        self.letters = tuple(letters)
+
+        # Слова хранятся по колонкам в порядке russian_word, как отдаёт get_words_by_filters
+        word_rows = sorted(word_rows, key=lambda row: row[word_columns.index('russian_word')])
+        self._columns = tuple(word_columns)
+        self._data = {
+            name: tuple(row[i] for row in word_rows)
+            for i, name in enumerate(word_columns)
+        }
+        self.size = len(word_rows)
+
+        category_names = {c['id']: c['name'] for c in self.categories}
+        letter_names = {l['id']: l['letter'] for l in self.letters}
+        self._data['category_name'] = tuple(category_names.get(c) for c in self._data['category_id'])
+        self._data['letter'] = tuple(letter_names.get(l) for l in self._data['letter_id'])
+        self._columns += ('category_name', 'letter')
+
+        # Индексы: позиции слов (по возрастанию) для каждой категории и буквы
+        self._by_category = self._build_index(self._data['category_id'])
+        self._by_letter = self._build_index(self._data['letter_id'])
+        self._with_translation = frozenset(
+            i for i, english in enumerate(self._data['english_word']) if english
+        )
+
+        # Все переводы по канонической форме — для обновления списков слов начатых сессий.
+        # Слово может встречаться несколько раз (в разных категориях, с переводом и без)
+        self._translations = {}
+        for russian, english in zip(self._data['russian_word'], self._data['english_word']):
+            translations = self._translations.setdefault(database.canonical_word(russian), set())
+            if english:
+                translations.add(english)
+
+        # Отпечаток содержимого: по нему сессии узнают, что словарь сменился
+        digest = hashlib.sha1()
+        for russian, english in zip(self._data['russian_word'], self._data['english_word']):
+            digest.update(f'{russian}\t{english or ""}\n'.encode('utf-8'))
+        self.fingerprint = digest.hexdigest()[:16]
+
+        # Кэш подсчётов живёт вместе со снимком и пропадает при его подмене
+        self._counts = {}
+
+    @staticmethod
+    def _build_index(values):
+        index = {}
+        for position, value in enumerate(values):
+            index.setdefault(value, array('I')).append(position)
+        return index
+
+    def _positions(self, category_ids=None, letter_ids=None, with_translation=False):
+        """Отсортированные позиции слов, подходящих под фильтры"""
+        selected = None
+        for ids, index in ((category_ids, self._by_category), (letter_ids, self._by_letter)):
+            if not ids:
+                continue
+            positions = set()
+            for value in ids:
+                positions.update(index.get(value, ()))
+            selected = positions if selected is None else selected & positions
+
+        if with_translation:
+            selected = set(self._with_translation) if selected is None else selected & self._with_translation
+
+        if selected is None:
+            return range(self.size)
+        return sorted(selected)
+
+    def _row(self, position):
+        return {name: self._data[name][position] for name in self._columns}
+
+    def get_words_by_filters(self, category_ids=None, letter_ids=None, limit=None):
+        """Получение слов по фильтрам"""
+        positions = self._positions(category_ids, letter_ids)
+        if limit:
+            positions = positions[:limit]
+        return [self._row(position) for position in positions]
+
+    def _cached(self, key, compute):
+        # Кэш читают несколько потоков: значение возвращаем из локальной переменной,
+        # ведь другой поток может очистить кэш сразу после записи
+        value = self._counts.get(key)
+        if value is None:
+            value = compute()
+            if len(self._counts) >= 1024:
+                self._counts.clear()
+            self._counts[key] = value
+        return value
+
+    def count_words_by_filters(self, category_ids=None, letter_ids=None, with_translation=False):
+        """Подсчет количества слов по фильтрам"""
+        key = ('count', tuple(sorted(category_ids or ())), tuple(sorted(letter_ids or ())), with_translation)
+        return self._cached(key, lambda: len(self._positions(category_ids, letter_ids, with_translation)))
+
+    def refresh_word_pairs(self, pairs):
+        """Пары слов, приведённые к текущему словарю: удалённые слова выпадают, исчезнувший
+        перевод заменяется оставшимся; пара выпадает, если у слова не осталось переводов"""
+        refreshed = []
+        for russian, english in pairs:
+            translations = self._translations.get(database.canonical_word(russian))
+            if translations is None:
+                continue
+            if english is None or english in translations:
+                refreshed.append((russian, english))
+            elif translations:
+                refreshed.append((russian, min(translations)))
+        return refreshed
+
+    def sample_words(self, count, category_ids=None, letter_ids=None, with_translation=False):
+        """Случайная выборка слов по фильтрам"""
+        positions = self._positions(category_ids, letter_ids, with_translation)
+        count = min(count, len(positions))
+        return [self._row(position) for position in random.sample(positions, count)]
+
+    def get_categories(self, category_type=None):
+        """Получение списка категорий"""
+        return [
+            dict(c) for c in self.categories
+            if not category_type or c['type'] == category_type
+        ]
+
+    def get_letters(self):
+        """Получение списка букв"""
+        return [dict(l) for l in self.letters]
+
+    def get_words_count_by_letter(self, category_id=None):
+        """Получение количества слов по буквам"""
+        counts = self._cached(('letters', category_id), lambda: self._count_by_letter(category_id))
+        return [dict(row) for row in counts]
+
+    def _count_by_letter(self, category_id):
+        result = []
+        for l in self.letters:
+            if category_id:
+                count = len(self._positions([category_id], [l['id']]))
+            else:
+                count = len(self._by_letter.get(l['id'], ()))
+            result.append({'letter': l['letter'], 'id': l['id'], 'count': count})
+        return result
+
+
+def load_snapshot():
+    """Чтение словаря из БД в новый снимок"""
+    # Словарь общий для всех школ — читаем его из основной базы
+    token = database.set_current_tenant(None)
+    try:
+        with database.get_db() as conn:
+            # Одна транзакция чтения — все три таблицы и номер версии словаря согласованы
+            conn.execute('BEGIN')
+            version = conn.execute('SELECT version FROM dictionary_version').fetchone()[0]
+            cursor = conn.execute('SELECT * FROM words')
+            word_columns = [column[0] for column in cursor.description]
+            word_rows = cursor.fetchall()
+            categories = [dict(row) for row in conn.execute('SELECT * FROM categories ORDER BY name')]
+            letters = [dict(row) for row in conn.execute('SELECT * FROM letters ORDER BY sort_order')]
+            conn.execute('COMMIT')
+    finally:
+        database.reset_current_tenant(token)
+
+    return WordSnapshot(word_rows, word_columns, categories, letters, version)
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_reload_lock = threading.RLock()
+_version_conn = None
+_watcher = None
+
+
+def current_dictionary_version():
+    """Счётчик изменений словаря; его увеличивают триггеры на words, categories и letters.
+    PRAGMA data_version не подходит: он меняется и от записи попыток учеников"""
+    global _version_conn
+    with _snapshot_lock:
+        if _version_conn is None:
+            _version_conn = sqlite3.connect(database.DATABASE_PATH, check_same_thread=False)
+        return _version_conn.execute('SELECT version FROM dictionary_version').fetchone()[0]
+
+
+def reload_snapshot():
+    """Загрузка нового снимка и атомарная подмена ссылки на него"""
+    global _snapshot
+    with _reload_lock:
+        started = time.perf_counter()
+        snapshot = load_snapshot()
+        # Читатели видят либо старый, либо новый снимок; кэши живут в самом снимке
+        _snapshot = snapshot
+        elapsed = (time.perf_counter() - started) * 1000
+    print(f"🔄 Словарь загружен за {elapsed:.1f} мс: {snapshot.size} слов (pid {os.getpid()})")
+    return snapshot
+
+
+def _watch(interval):
+    """Фоновая проверка версии словаря; перечитывает его, когда правка словаря затихла"""
+    last_seen = None
+    while True:
+        time.sleep(interval)
+        try:
+            version = current_dictionary_version()
+            snapshot = _snapshot
+            # Ждём, пока версия не изменится за целый интервал: populate_database
+            # пишет по одному слову, и промежуточное состояние загружать незачем
+            if snapshot is not None and version != snapshot.dictionary_version and version == last_seen:
+                reload_snapshot()
+            last_seen = version
+        except Exception as e:
+            print(f"⚠️ Не удалось перечитать словарь: {e}")
+
+
+def get_snapshot(reload_interval=1.0):
+    """Текущий снимок словаря; при первом обращении загружает его и запускает фоновую проверку"""
+    global _watcher
+    snapshot = _snapshot
+    if snapshot is not None:
+        return snapshot
+
+    with _reload_lock:
+        if _snapshot is None:
+            reload_snapshot()
+        if _watcher is None and reload_interval:
+            _watcher = threading.Thread(
+                target=_watch, args=(reload_interval,), name='snapshot-watcher', daemon=True
+            )
+            _watcher.start()
+    return _snapshot
+
+
+def _reset_after_fork():
+    """Соединения SQLite и потоки нельзя использовать в дочернем процессе после fork"""
+    global _snapshot, _snapshot_lock, _reload_lock, _version_conn, _watcher
+    # Снимок родителя мог устареть, пока мастер ждал fork — перечитываем
+    _snapshot = None
+    _snapshot_lock = threading.Lock()
+    _reload_lock = threading.RLock()
+    _version_conn = None
+    _watcher = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -145,20 +145,11 @@ async function speakWord() {
 
         if (data.finished) return;
 
-        const audioResponse = await fetch('/api/generate_audio', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                word: data.speak_word,
-                lang: data.speak_lang
-            })
-        });
-
-        const audioData = await audioResponse.json();
+        const audioData = await requestAudio(data.speak_word, data.speak_lang);
 
         if (audioData.success) {
             const audio = document.getElementById('audio-player');
-            audio.src = audioData.audio_url;
+            audio.src = await loadAudioSource(audio, audioData.audio_url);
             await audio.play();
             audio.onended = () => { isPlaying = false; };
         } else {
@@ -171,6 +162,45 @@ async function speakWord() {
     }
 }
 
+// Запрос аудио; при ответе 429 ждём Retry-After и пробуем ещё раз
+async function requestAudio(word, lang, retries = 2) {
+    const response = await fetch('/api/generate_audio', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ word: word, lang: lang })
+    });
+
+    if (response.status === 429 && retries > 0) {
+        const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || 1;
+        await new Promise(resolve => setTimeout(resolve, Math.min(retryAfter, 5) * 1000));
+        return requestAudio(word, lang, retries - 1);
+    }
+
+    return response.json();
+}
+
+// Загрузка аудио: браузерам с поддержкой Opus сервер отдаёт компактный WebM-вариант
+let audioObjectUrl = null;
+
+async function loadAudioSource(audio, url) {
+    if (!audio.canPlayType('audio/webm; codecs="opus"')) {
+        return url;
+    }
+
+    const response = await fetch(url, {
+        headers: { 'Accept': 'audio/webm, audio/mpeg;q=0.9' }
+    });
+    if (!response.ok) {
+        return url;
+    }
+
+    if (audioObjectUrl) {
+        URL.revokeObjectURL(audioObjectUrl);
+    }
+    audioObjectUrl = URL.createObjectURL(await response.blob());
+    return audioObjectUrl;
+}
+
 // Проверка ответа
 async function checkAnswer() {
     const answer = document.getElementById('answer-input').value.trim();
@@ -0,0 +1,199 @@
+"""
+Бэкенды синтеза речи (TTS) для озвучивания слов
+"""
+
+import os
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Один кадр тишины MPEG-1 Layer III (128 кбит/с, 44.1 кГц) для фейкового бэкенда
+SILENT_MP3_FRAME = b'\xff\xfb\x90\x64' + bytes(413)
+
+# «--» перед текстом: слово, начинающееся с дефиса, не должно читаться движком как опция
+DEFAULT_LOCAL_COMMAND = 'espeak-ng -v {voice} -w {output} -- {text}'
+DEFAULT_LOCAL_VOICES = {'ru': 'ru', 'en': 'en'}
+
+
+class TTSError(Exception):
+    """Ошибка синтеза речи"""
+
+
+class TTSBackend:
+    """Базовый класс бэкенда синтеза речи"""
+
+    name = 'base'
+    extension = 'mp3'
+
+    def __init__(self, timeout=10.0, max_concurrency=4):
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Обработчики, вызываемые для каждого нового файла после синтеза
+        self.postprocessors = []
+
+    def synthesize(self, text, lang, filepath):
+        """Синтез одного слова в файл"""
+        # Ограничиваем число одновременных синтезов этого бэкенда
+        if not self._semaphore.acquire(timeout=self.timeout):
+            raise TTSError(f'Нет свободного слота синтеза ({self.name})')
+        try:
+            # Пишем во временный файл, чтобы не отдавать недописанное аудио
+            tmp_path = f'{filepath}.{uuid.uuid4().hex}.tmp'
+            try:
+                self._synthesize(text, lang, tmp_path)
+                os.replace(tmp_path, filepath)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        finally:
+            self._semaphore.release()
+
+        for postprocess in self.postprocessors:
+            postprocess(filepath)
+
+    def synthesize_batch(self, items, guard=None):
+        """Пакетный синтез: items — список (text, lang, filepath), возвращает {filepath: ошибка или None}.
+        guard — фабрика контекстного менеджера вокруг каждого синтеза (например, слот допуска)"""
+        executor = self._get_executor()
+        futures = [
+            (filepath, executor.submit(self._synthesize_guarded, guard, text, lang, filepath))
+            for text, lang, filepath in items
+        ]
+
+        results = {}
+        for filepath, future in futures:
+            try:
+                future.result()
+                results[filepath] = None
+            except Exception as e:
+                results[filepath] = str(e) or e.__class__.__name__
+        return results
+
+    def _synthesize_guarded(self, guard, text, lang, filepath):
+        if guard is None:
+            return self.synthesize(text, lang, filepath)
+        with guard():
+            return self.synthesize(text, lang, filepath)
+
+    def shutdown(self):
+        """Остановка пула потоков бэкенда"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def _get_executor(self):
+        """Ленивое создание пула потоков для пакетного синтеза"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix=f'tts-{self.name}'
+                )
+            return self._executor
+
+    def _synthesize(self, text, lang, filepath):
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """Синтез через Google Translate TTS (сетевой запрос на каждое слово)"""
+
+    name = 'gtts'
+    extension = 'mp3'
+
+    def _synthesize(self, text, lang, filepath):
+        from gtts import gTTS
+
+        tts = gTTS(text=text, lang=lang, timeout=self.timeout)
+        tts.save(filepath)
+
+
+class LocalProcessBackend(TTSBackend):
+    """Синтез локальным движком (espeak-ng, RHVoice и т.п.) в отдельном процессе"""
+
+    name = 'local'
+
+    def __init__(self, command=DEFAULT_LOCAL_COMMAND, voices=None, extension='wav',
+                 timeout=10.0, max_concurrency=None):
+        # Движок нагружает процессор, поэтому по умолчанию — по процессу на ядро
+        if max_concurrency is None:
+            max_concurrency = os.cpu_count() or 1
+        super().__init__(timeout=timeout, max_concurrency=max_concurrency)
+        self.command = shlex.split(command)
+        self.voices = voices or DEFAULT_LOCAL_VOICES
+        self.extension = extension
+
+    def _synthesize(self, text, lang, filepath):
+        # Защита и для команд без «--» в конфигурации
+        if text.lstrip().startswith('-'):
+            raise TTSError('Текст не может начинаться с дефиса')
+
+        values = {
+            'text': text,
+            'lang': lang,
+            'voice': self.voices.get(lang, lang),
+            'output': filepath,
+        }
+        # Подставляем значения в каждый аргумент отдельно — без оболочки
+        args = [part.format(**values) for part in self.command]
+
+        try:
+            subprocess.run(args, check=True, capture_output=True, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            raise TTSError(f'Превышено время синтеза ({self.timeout} с)')
+        except subprocess.CalledProcessError as e:
+            message = e.stderr.decode('utf-8', 'replace').strip()
+            raise TTSError(f'Движок завершился с кодом {e.returncode}: {message}')
+        except FileNotFoundError:
+            raise TTSError(f'Движок не найден: {args[0]}')
+
+
+class FakeBackend(TTSBackend):
+    """Фейковый синтез без сети и движков — для тестов и нагрузочного тестирования"""
+
+    name = 'fake'
+    extension = 'mp3'
+
+    def __init__(self, delay=0.0, timeout=10.0, max_concurrency=64):
+        super().__init__(timeout=timeout, max_concurrency=max_concurrency)
+        self.delay = delay
+
+    def _synthesize(self, text, lang, filepath):
+        if self.delay:
+            time.sleep(self.delay)
+        with open(filepath, 'wb') as f:
+            f.write(SILENT_MP3_FRAME)
+
+
+BACKENDS = {
+    'gtts': GTTSBackend,
+    'local': LocalProcessBackend,
+    'fake': FakeBackend,
+}
+
+
+def create_backend(config):
+    """Создание бэкенда по конфигурации приложения"""
+    name = config.get('TTS_BACKEND', 'gtts')
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный TTS-бэкенд: '{name}'")
+
+    kwargs = {'timeout': config.get('TTS_TIMEOUT', 10.0)}
+    if config.get('TTS_MAX_CONCURRENCY'):
+        kwargs['max_concurrency'] = config['TTS_MAX_CONCURRENCY']
+
+    if name == 'local':
+        kwargs['command'] = config.get('TTS_LOCAL_COMMAND', DEFAULT_LOCAL_COMMAND)
+        kwargs['voices'] = config.get('TTS_LOCAL_VOICES')
+        kwargs['extension'] = config.get('TTS_LOCAL_FORMAT', 'wav')
+    elif name == 'fake':
+        kwargs['delay'] = config.get('TTS_FAKE_DELAY', 0.0)
+
+    return BACKENDS[name](**kwargs)